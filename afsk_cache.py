@@ -0,0 +1,139 @@
+from collections import OrderedDict
+import numpy as np
+from afsk_tx import build_packet, modulate_packet
+from afsk_utils import FS, BAUD_RATE, F0, F1, signal_to_int16
+
+# --- Configurações do Cache ---
+# Perfil de modulação padrão (FS, Baud Rate, F0, F1). Faz parte da chave do cache
+# para que formas de onda geradas com parâmetros diferentes nunca sejam confundidas.
+DEFAULT_PROFILE = (FS, BAUD_RATE, F0, F1)
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024  # Orçamento de memória do cache (4 MiB)
+
+class WaveformCache:
+    """
+    Cache LRU de formas de onda moduladas, limitado por orçamento de bytes.
+
+    Beacons periódicos e retransmissões do mesmo quadro geram exatamente o mesmo
+    sinal AFSK. O cache guarda o sinal já convertido para int16 (formato de saída
+    do WAV e da placa de som), de modo que um acerto vai direto para a saída sem
+    reconstruir o pacote nem modular novamente.
+
+    Chave: (payload, user_id_tx, user_id_rx, profile)
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes <= 0:
+            raise ValueError("O orçamento do cache deve ser maior que zero.")
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def get(self, key):
+        """
+        Retorna o sinal int16 associado à chave (marcando-o como mais recente),
+        ou None se não estiver no cache.
+        """
+        signal = self._entries.get(key)
+        if signal is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return signal
+
+    def put(self, key, signal: np.ndarray):
+        """
+        Insere um sinal no cache, descartando as entradas menos usadas até que o
+        total caiba no orçamento. Sinais maiores que o orçamento não são guardados.
+        """
+        signal = signal_to_int16(signal)
+        size = signal.nbytes
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old.nbytes
+
+        while self._entries and self.current_bytes + size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+            self.evictions += 1
+
+        # O buffer é somente leitura: o mesmo array é entregue a todos os acertos
+        signal.setflags(write=False)
+        self._entries[key] = signal
+        self.current_bytes += size
+
+    def clear(self):
+        """
+        Esvazia o cache (as estatísticas são mantidas).
+        """
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Retorna as estatísticas de uso do cache.
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+def get_modulated_signal(cache: WaveformCache, message: str, user_id_tx: int, user_id_rx: int = 0,
+                         profile: tuple = DEFAULT_PROFILE) -> tuple[np.ndarray, bool]:
+    """
+    Retorna o sinal AFSK (int16) para a mensagem, usando o cache quando possível.
+
+    Retorna: (sinal_int16, cache_hit)
+    """
+    key = (message, user_id_tx, user_id_rx, profile)
+    signal = cache.get(key)
+    if signal is not None:
+        return signal, True
+
+    packet = build_packet(message, user_id_tx, user_id_rx)
+    signal = signal_to_int16(modulate_packet(packet))
+    cache.put(key, signal)
+    return signal, False
+
+if __name__ == '__main__':
+    import time
+
+    cache = WaveformCache(max_bytes=64 * 1024)
+
+    # Primeiro envio: miss (constrói e modula)
+    t0 = time.perf_counter()
+    signal, hit = get_modulated_signal(cache, "BEACON", 10, 0)
+    t_miss = time.perf_counter() - t0
+
+    # Repetição do mesmo beacon: hit (sem modulação)
+    t0 = time.perf_counter()
+    signal_again, hit_again = get_modulated_signal(cache, "BEACON", 10, 0)
+    t_hit = time.perf_counter() - t0
+
+    print(f"Miss: {t_miss * 1000:.2f} ms (hit={hit}) | Hit: {t_hit * 1000:.4f} ms (hit={hit_again})")
+    assert not hit and hit_again
+    assert signal is signal_again
+
+    # Enche o cache para forçar descarte por orçamento de bytes
+    for i in range(20):
+        get_modulated_signal(cache, f"MSG {i}", 10, 20)
+    print(f"Estatísticas: {cache.stats()}")
+    assert cache.current_bytes <= cache.max_bytes
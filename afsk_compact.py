@@ -0,0 +1,387 @@
+import queue
+import threading
+import numpy as np
+import crcmod.crcmod
+from typing import NamedTuple
+from afsk_utils import SAMPLES_PER_BIT, PREAMBLE_BYTE, calculate_crc16_ccitt, check_crc16_ccitt
+from afsk_tx import modulate_packet
+from afsk_rx import demodulate_windows
+
+# --- Modo de Framing ---
+FRAMING_STANDARD = 'standard'  # Formato estendido (afsk_tx.build_packet)
+FRAMING_COMPACT = 'compact'  # Rajadas compactas (este módulo)
+
+# --- Formato Compacto ---
+# Uma rajada compartilha um único Preamble + Sync entre vários quadros:
+# [Preamble (1)] [Sync (2)] [Flags (1)] [ID TX (1)]? [ID RX (1)]? [Len fixo (1)]? [HCS (1)]
+# e, para cada quadro: [Len (1)]? [Payload (0-255)] [CRC-16 (2)]
+# O HCS (CRC-8 do cabeçalho) protege o contador e o Len fixo: sem ele, um bit errado
+# faria o receptor consumir quadros que não existem (e as rajadas seguintes).
+# O CRC de cada quadro cobre o cabeçalho da rajada (sem o HCS) + o seu Len (se houver) + o Payload.
+COMPACT_PREAMBLE_BYTES = bytes([PREAMBLE_BYTE])
+COMPACT_SYNC_WORD = 0x467A  # Diferente da Sync Word padrão: os dois formatos convivem no mesmo canal
+COMPACT_SYNC_BYTES = COMPACT_SYNC_WORD.to_bytes(2, byteorder='big')
+
+FLAG_ADDRESSED = 0x80  # IDs TX/RX presentes no cabeçalho da rajada
+FLAG_FIXED_LEN = 0x40  # Um único Len no cabeçalho vale para todos os quadros da rajada
+COUNT_MASK = 0x3F  # Quadros na rajada - 1
+MAX_BURST_FRAMES = COUNT_MASK + 1
+BURST_FLUSH_TIMEOUT = 0.2  # s sem nova mensagem antes de enviar uma rajada incompleta (entrada interativa)
+
+# Correlação suave normalizada (1.0 = padrão perfeito) exigida para aceitar a Sync.
+# Cada bit errado no padrão de 24 bits custa ~0.08; os lóbulos laterais do padrão
+# (inclusive contra Preamble + Sync dos formatos padrão e adaptativo) ficam em ~0.33.
+SYNC_CORRELATION_THRESHOLD = 0.7
+
+# CRC-8 (polinômio x^8 + x^2 + x + 1) do cabeçalho da rajada
+crc8_header = crcmod.crcmod.Crc(0x107, initCrc=0x00, xorOut=0x00, rev=False)
+
+def header_check(header: bytes) -> int:
+    return crc8_header.new(header).crcValue
+
+def _header_len(flags: int) -> int:
+    return 1 + 2 * bool(flags & FLAG_ADDRESSED) + bool(flags & FLAG_FIXED_LEN)
+
+def _pattern_bits() -> np.ndarray:
+    return np.unpackbits(np.frombuffer(COMPACT_PREAMBLE_BYTES + COMPACT_SYNC_BYTES, dtype=np.uint8))
+
+PATTERN_BITS = _pattern_bits()
+PATTERN_SIGNS = PATTERN_BITS.astype(np.float64) * 2 - 1  # bit 1 -> +1, bit 0 -> -1
+
+class CompactFrame(NamedTuple):
+    start_sample: int  # Início do Preamble da rajada
+    burst_index: int  # Posição do quadro dentro da rajada
+    id_tx: int | None  # None quando a rajada não leva endereços
+    id_rx: int | None
+    payload: bytes
+    crc_ok: bool
+
+# --- TX ---
+
+def build_compact_burst(payloads, user_id_tx: int = None, user_id_rx: int = None) -> bytes:
+    """
+    Monta uma rajada compacta com um ou mais Payloads (str ou bytes).
+
+    - Com user_id_tx/user_id_rx, a rajada leva os dois IDs (uma vez para todos os quadros);
+    - Se todos os Payloads têm o mesmo tamanho, Len vai uma única vez no cabeçalho.
+    """
+    payloads = [p.encode('ascii') if isinstance(p, str) else p for p in payloads]
+    if not 1 <= len(payloads) <= MAX_BURST_FRAMES:
+        raise ValueError(f"Uma rajada deve ter de 1 a {MAX_BURST_FRAMES} quadros.")
+    if any(len(p) > 255 for p in payloads):
+        raise ValueError("Mensagem muito longa. O Payload deve ter no máximo 255 bytes.")
+    if (user_id_tx is None) != (user_id_rx is None):
+        raise ValueError("Informe os dois IDs (TX e RX) ou nenhum.")
+
+    fixed_len = len({len(p) for p in payloads}) == 1
+    flags = len(payloads) - 1
+    header = b""
+    if user_id_tx is not None:
+        flags |= FLAG_ADDRESSED
+        header += bytes([user_id_tx, user_id_rx])
+    if fixed_len:
+        flags |= FLAG_FIXED_LEN
+        header += bytes([len(payloads[0])])
+    header = bytes([flags]) + header
+
+    body = b""
+    for payload in payloads:
+        frame = payload if fixed_len else bytes([len(payload)]) + payload
+        body += frame + calculate_crc16_ccitt(header + frame)
+    return COMPACT_PREAMBLE_BYTES + COMPACT_SYNC_BYTES + header + bytes([header_check(header)]) + body
+
+def modulate_compact_burst(payloads, user_id_tx: int = None, user_id_rx: int = None) -> np.ndarray:
+    return modulate_packet(build_compact_burst(payloads, user_id_tx, user_id_rx))
+
+_STALLED = object()  # Marcador: a entrada não produziu mensagem dentro do timeout
+_END = object()
+
+def _iter_with_stalls(messages, timeout: float):
+    """
+    Consome messages em uma thread e repassa cada mensagem; quando nenhuma chega
+    em timeout segundos, produz _STALLED (a iteração continua esperando a próxima).
+    """
+    pending = queue.Queue()
+
+    def reader():
+        try:
+            for message in messages:
+                pending.put(message)
+        except Exception as e:  # Repassado para quem consome
+            pending.put(e)
+        pending.put(_END)
+
+    threading.Thread(target=reader, name="afsk-compact-input", daemon=True).start()
+    while True:
+        try:
+            item = pending.get(timeout=timeout)
+        except queue.Empty:
+            yield _STALLED
+            continue
+        if item is _END:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+def iter_compact_bursts(messages, user_id_tx: int = None, user_id_rx: int = None,
+                        burst_size: int = MAX_BURST_FRAMES, flush_timeout: float = None):
+    """
+    Agrupa uma sequência de mensagens em rajadas de até burst_size quadros e gera
+    o sinal (float64) de cada rajada.
+
+    Com flush_timeout (s), uma rajada incompleta é enviada assim que a entrada fica
+    esse tempo sem produzir mensagens (stdin, pipes): a latência volta a ser de
+    ~1 quadro em vez de esperar burst_size linhas.
+    """
+    if flush_timeout is not None:
+        messages = _iter_with_stalls(messages, flush_timeout)
+    batch = []
+    for message in messages:
+        if message is _STALLED:
+            if batch:
+                yield modulate_compact_burst(batch, user_id_tx, user_id_rx)
+                batch = []
+            continue
+        batch.append(message)
+        if len(batch) == burst_size:
+            yield modulate_compact_burst(batch, user_id_tx, user_id_rx)
+            batch = []
+    if batch:
+        yield modulate_compact_burst(batch, user_id_tx, user_id_rx)
+
+def frame_overhead_bytes(n_frames: int, addressed: bool = True, fixed_len: bool = True) -> float:
+    """
+    Bytes de overhead (tudo exceto o Payload) por quadro em uma rajada de n_frames.
+    """
+    shared = len(COMPACT_PREAMBLE_BYTES) + len(COMPACT_SYNC_BYTES) + 1 + 2 * addressed + fixed_len + 1
+    return shared / n_frames + (not fixed_len) + 2
+
+# --- RX ---
+
+def find_compact_sync(audio: np.ndarray) -> tuple[int, float] | None:
+    """
+    Procura o Preamble + Sync compactos por correlação suave em todos os deslocamentos
+    de amostra. Cada janela de bit vira um valor suave em [-1, 1] ((P1 - P0) / (P1 + P0)),
+    então alguns bits errados no padrão apenas reduzem a correlação, sem perder o quadro.
+
+    Retorna: (amostra_do_início_do_padrão, correlação) do primeiro padrão encontrado, ou None.
+    """
+    spb = SAMPLES_PER_BIT
+    n = len(PATTERN_SIGNS)
+    candidates = []  # (início, correlação)
+    for offset in range(spb):
+        _, powers = demodulate_windows(audio[offset:])
+        if len(powers) < n:
+            continue
+        soft = (powers[:, 1] - powers[:, 0]) / np.maximum(powers.sum(axis=1), 1e-12)
+        corr = np.correlate(soft, PATTERN_SIGNS, 'valid') / n
+        hits = np.nonzero(corr >= SYNC_CORRELATION_THRESHOLD)[0]
+        if len(hits):
+            i = hits[0]
+            candidates.append((offset + i * spb, float(corr[i])))
+    if not candidates:
+        return None
+
+    # Entre os deslocamentos que enxergam o mesmo padrão (até 1 bit adiante), fica o pico
+    first = min(start for start, _ in candidates)
+    return max((c for c in candidates if c[0] < first + spb), key=lambda c: c[1])
+
+class CompactDecoder:
+    """
+    Receptor incremental de rajadas compactas: aceita blocos de áudio de qualquer
+    tamanho e devolve cada quadro assim que o seu CRC chega.
+
+    Durante uma rajada, os bytes já demodulados ficam guardados com um cursor de
+    leitura: cada bloco novo só demodula as janelas que chegaram, e o áudio até o
+    último quadro confirmado é descartado (custo linear no tamanho da rajada).
+
+    Um HCS inválido descarta a sincronização. Depois de um quadro com CRC inválido e
+    Len próprio, os limites dos quadros seguintes são desconhecidos: a rajada termina
+    e a caça ao sincronismo recomeça logo após o último trecho confirmado (cabeçalho
+    ou quadro com CRC válido), então nenhuma rajada seguinte é engolida.
+    """
+
+    def __init__(self):
+        self._buffer = np.array([], dtype=np.float64)
+        self._base = 0  # Índice global da primeira amostra do buffer
+        self._burst_start = None  # Início global do padrão da rajada atual (None = caçando)
+        self._body = 0  # Amostra global logo após o padrão de sincronismo
+        self._bits_done = 0  # Janelas de bit já demoduladas desde _body
+        self._pending_bits = np.array([], dtype=np.uint8)  # Bits que ainda não fecham um byte
+        self._data = bytearray()  # Bytes demodulados desde _body
+        self._header = None  # Cabeçalho validado pelo HCS (sem o HCS)
+        self._pos = 0  # Cursor de leitura em _data (início do próximo quadro)
+        self._index = 0  # Índice do próximo quadro na rajada
+        self._verified = 0  # Fim (em bytes) do último trecho confirmado
+
+    def feed(self, samples: np.ndarray) -> list[CompactFrame]:
+        self._buffer = np.concatenate((self._buffer, samples))
+        frames = []
+        while True:
+            if self._burst_start is None:
+                found = find_compact_sync(self._buffer)
+                if found is None:
+                    # Guarda apenas o suficiente para um padrão que esteja chegando
+                    keep = (len(PATTERN_BITS) + 1) * SAMPLES_PER_BIT
+                    self._discard_until(self._base + max(0, len(self._buffer) - keep))
+                    return frames
+                self._start_burst(self._base + found[0])
+
+            self._demodulate_new_windows()
+            if not self._parse(frames):
+                return frames  # Esperando mais áudio
+
+    def flush(self) -> list[CompactFrame]:
+        """
+        Fim do stream: uma rajada à espera de bytes que não vão chegar (ex.: Len
+        corrompido) é abandonada, e o áudio após o último trecho confirmado volta
+        para a caça ao sincronismo.
+        """
+        frames = []
+        while self._burst_start is not None:
+            if self._header is None:
+                self._end_burst(self._burst_start + SAMPLES_PER_BIT)
+            else:
+                self._end_burst(self._byte_sample(self._verified))
+            frames.extend(self.feed(np.array([], dtype=np.float64)))
+        return frames
+
+    def _start_burst(self, start: int):
+        self._burst_start = start
+        self._body = start + len(PATTERN_BITS) * SAMPLES_PER_BIT
+        self._bits_done = 0
+        self._pending_bits = np.array([], dtype=np.uint8)
+        self._data = bytearray()
+        self._header = None
+        self._pos = self._index = self._verified = 0
+        self._discard_until(start)
+
+    def _end_burst(self, resume: int):
+        """
+        Encerra a rajada e volta a caçar o sincronismo a partir da amostra global resume.
+        """
+        self._burst_start = None
+        self._discard_until(resume)
+
+    def _demodulate_new_windows(self):
+        first = self._body + self._bits_done * SAMPLES_PER_BIT - self._base
+        n_new = (len(self._buffer) - first) // SAMPLES_PER_BIT
+        if n_new <= 0:
+            return
+        bits, _ = demodulate_windows(self._buffer[first:first + n_new * SAMPLES_PER_BIT])
+        self._bits_done += n_new
+        bits = np.concatenate((self._pending_bits, bits))
+        n_bytes = len(bits) // 8
+        self._data += np.packbits(bits[:n_bytes * 8]).tobytes()
+        self._pending_bits = bits[n_bytes * 8:]
+
+    def _parse(self, frames: list) -> bool:
+        """
+        Avança o cursor pelos bytes já demodulados. Retorna True se a rajada terminou
+        (e a caça ao sincronismo deve continuar), False se faltam bytes.
+        """
+        data = self._data
+        if self._header is None:
+            if not data or len(data) < _header_len(data[0]) + 1:
+                return False
+            header_len = _header_len(data[0])
+            if header_check(bytes(data[:header_len])) != data[header_len]:
+                # Falso sincronismo ou cabeçalho corrompido: procura de novo após este padrão
+                self._end_burst(self._burst_start + SAMPLES_PER_BIT)
+                return True
+            self._header = bytes(data[:header_len])
+            self._pos = self._verified = header_len + 1
+
+        header = self._header
+        flags = header[0]
+        id_tx, id_rx = (header[1], header[2]) if flags & FLAG_ADDRESSED else (None, None)
+        while self._index <= flags & COUNT_MASK:
+            if flags & FLAG_FIXED_LEN:
+                len_field = b""
+                payload_len = header[-1]
+            else:
+                if self._pos >= len(data):
+                    return False
+                len_field = bytes(data[self._pos:self._pos + 1])
+                payload_len = len_field[0]
+            frame_end = self._pos + len(len_field) + payload_len + 2
+            if frame_end > len(data):
+                return False
+            payload = bytes(data[self._pos + len(len_field):frame_end - 2])
+            crc_ok = check_crc16_ccitt(header + len_field + payload, bytes(data[frame_end - 2:frame_end]))
+            frames.append(CompactFrame(self._burst_start, self._index, id_tx, id_rx, payload, crc_ok))
+            self._index += 1
+            self._pos = frame_end
+            if crc_ok:
+                self._verified = frame_end
+                self._discard_until(self._byte_sample(frame_end))
+            elif not flags & FLAG_FIXED_LEN:
+                break
+        self._end_burst(self._byte_sample(self._verified))
+        return True
+
+    def _byte_sample(self, byte_pos: int) -> int:
+        return self._body + byte_pos * 8 * SAMPLES_PER_BIT
+
+    def _discard_until(self, sample: int):
+        n = sample - self._base
+        if n > 0:
+            self._buffer = self._buffer[n:]
+            self._base = sample
+
+def receive_compact(audio: np.ndarray) -> list[CompactFrame]:
+    """
+    Decodifica todas as rajadas compactas de um trecho de áudio.
+    """
+    decoder = CompactDecoder()
+    return decoder.feed(audio) + decoder.flush()
+
+if __name__ == '__main__':
+    from afsk_tx import build_packet
+    from afsk_stream import FrameDecoder
+
+    telemetry = [f"T{23 + i % 5}" for i in range(16)]  # Mensagens curtas de 3 bytes
+
+    # Overhead por quadro: formato padrão x rajadas compactas
+    standard = len(build_packet(telemetry[0], 10, 20)) - len(telemetry[0])
+    print(f"Overhead por quadro (payload de {len(telemetry[0])} bytes):")
+    print(f"  padrão:                           {standard:5.2f} bytes")
+    for n in (1, 4, 16):
+        compact = frame_overhead_bytes(n)
+        print(f"  compacto, rajada de {n:2d} (com IDs): {compact:5.2f} bytes "
+              f"({100 * (1 - compact / standard):.0f}% menor)")
+
+    # Rajada com erros de bit no Preamble/Sync: a correlação suave ainda sincroniza
+    rng = np.random.default_rng(1)
+    burst = build_compact_burst(telemetry, 10, 20)
+    signal = np.concatenate((np.zeros(1234), modulate_packet(burst), np.zeros(500)))
+    spb = SAMPLES_PER_BIT
+    for bit in (3, 14):  # Inverte dois bits do padrão (troca o molde do bit)
+        i = 1234 + bit * spb
+        signal[i:i + spb] = modulate_packet(bytes([0x80 if PATTERN_BITS[bit] == 0 else 0x00]))[:spb]
+    signal += rng.normal(0, 0.05, len(signal))
+
+    frames = receive_compact(signal)
+    assert [f.payload.decode() for f in frames] == telemetry and all(f.crc_ok for f in frames)
+    print(f"Rajada com 2 bits errados no padrão: {len(frames)} quadros, todos com CRC OK "
+          f"(início na amostra {frames[0].start_sample})")
+
+    # Convivência com o formato padrão: cada receptor ignora o formato do outro
+    mixed = np.concatenate((modulate_packet(build_packet("PADRAO", 10, 20)), np.zeros(26 * 10),
+                            modulate_compact_burst(["C1", "C2"]), np.zeros(26 * 10)))
+    standard_frames = FrameDecoder().feed(mixed)
+    compact_frames = receive_compact(mixed)
+    print(f"Canal misto: padrão -> {[f.payload for f in standard_frames]}, "
+          f"compacto -> {[f.payload for f in compact_frames]}")
+    assert [f.payload for f in standard_frames] == [b"PADRAO"]
+    assert [f.payload for f in compact_frames] == [b"C1", b"C2"]
+
+    # Contador corrompido (4 -> 64 quadros): o HCS rejeita o cabeçalho e a rajada seguinte é recebida
+    corrupted = bytearray(build_compact_burst(["A", "B", "C", "D"], 10, 20))
+    corrupted[len(PATTERN_BITS) // 8] |= COUNT_MASK
+    channel = np.concatenate((modulate_packet(bytes(corrupted)), np.zeros(26 * 10),
+                              modulate_compact_burst(["OK1", "OK2"], 10, 20), np.zeros(26 * 10)))
+    recovered = receive_compact(channel)
+    print(f"Cabeçalho com contador corrompido seguido de outra rajada: {[f.payload for f in recovered]}")
+    assert [f.payload for f in recovered] == [b"OK1", b"OK2"]
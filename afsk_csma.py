@@ -0,0 +1,267 @@
+import time
+import numpy as np
+from afsk_utils import SAMPLES_PER_BIT, F0, F1
+from afsk_rx import goertzel_bank
+
+# --- Configurações do CSMA ---
+DEFAULT_SLOT_TIME = 0.1  # s (KISS: SlotTime = 10 -> 100 ms)
+MIN_SLOT_TIME_UNITS = 1  # KISS SlotTime mínimo (10 ms): slot nulo faria o laço de acesso girar sem esperar
+DEFAULT_PERSISTENCE = 0.25  # p (KISS: P = 63 -> (63 + 1) / 256)
+BUSY_THRESHOLD = 0.01  # Energia normalizada (~amplitude^2) em F0+F1 que indica canal ocupado
+BUSY_HANGOVER_WINDOWS = 8  # Janelas de bit em que o canal continua "ocupado" após a última detecção
+CARRIER_STALE_SECONDS = 1.0  # Sem áudio de RX por mais que isso, a detecção deixa de valer
+MAX_BACKOFF_EXPONENT = 6  # Backoff exponencial: até 2^6 - 1 slots
+
+MODE_P_PERSISTENT = 'p-persistent'
+MODE_EXPONENTIAL = 'exponential'
+MODE_ALOHA = 'aloha'  # Sem escuta do canal (referência para a simulação)
+
+# --- Detecção de Portadora ---
+
+class CarrierSense:
+    """
+    Detector contínuo de portadora: energia de Goertzel em F0 e F1 a cada janela de bit.
+
+    A energia é normalizada (4|X[k]|^2 / N^2), de modo que um tom de amplitude A
+    resulta em ~A^2, independentemente do tamanho da janela. O canal é considerado
+    ocupado enquanto alguma janela recente (hangover) passar do limiar.
+
+    A detecção só vale enquanto o áudio de RX continua chegando: se feed() não for
+    chamado por stale_after segundos (RX parado), busy volta a False, como em um
+    backend sem RX, em vez de manter o canal "ocupado" para sempre.
+    """
+
+    def __init__(self, threshold: float = BUSY_THRESHOLD, hangover: int = BUSY_HANGOVER_WINDOWS,
+                 stale_after: float = CARRIER_STALE_SECONDS, clock=time.monotonic):
+        self.threshold = threshold
+        self.hangover = hangover
+        self.stale_after = stale_after
+        self.clock = clock
+        self.last_energy = 0.0
+        self._last_feed = None
+        self._vectors = goertzel_bank(SAMPLES_PER_BIT, (F0, F1))
+        self._pending = np.array([], dtype=np.float64)
+        self._quiet_windows = hangover  # Janelas desde a última detecção
+
+    def feed(self, samples: np.ndarray) -> bool:
+        """
+        Processa um bloco de amostras e retorna se o canal está ocupado.
+        """
+        self._last_feed = self.clock()
+        self._pending = np.concatenate((self._pending, samples))
+        n = len(self._pending) // SAMPLES_PER_BIT
+        if n:
+            windows = self._pending[:n * SAMPLES_PER_BIT].reshape(n, SAMPLES_PER_BIT)
+            self._pending = self._pending[n * SAMPLES_PER_BIT:]
+            energy = (4 * np.abs(windows @ self._vectors) ** 2 / SAMPLES_PER_BIT ** 2).sum(axis=1)
+            self.last_energy = float(energy[-1])
+            hits = np.nonzero(energy > self.threshold)[0]
+            if len(hits):
+                self._quiet_windows = n - 1 - hits[-1]
+            else:
+                self._quiet_windows += n
+        return self.busy
+
+    @property
+    def stale(self) -> bool:
+        return self._last_feed is None or self.clock() - self._last_feed > self.stale_after
+
+    @property
+    def busy(self) -> bool:
+        return self._quiet_windows < self.hangover and not self.stale
+
+# --- Controle de Acesso ao Meio ---
+
+class CsmaMac:
+    """
+    Decisão de acesso ao meio, slot a slot.
+
+    p-persistente: com o canal livre, transmite com probabilidade p; caso contrário
+    (ou com o canal ocupado) espera um slot e tenta de novo.
+
+    Exponencial: ao encontrar o canal ocupado (ou após uma colisão), sorteia um
+    backoff uniforme em [0, 2^k - 1] slots, com k crescente até MAX_BACKOFF_EXPONENT;
+    o contador só anda com o canal livre.
+    """
+
+    def __init__(self, mode: str = MODE_P_PERSISTENT, persistence: float = DEFAULT_PERSISTENCE,
+                 slot_time: float = DEFAULT_SLOT_TIME, rng: np.random.Generator = None):
+        if mode not in (MODE_P_PERSISTENT, MODE_EXPONENTIAL, MODE_ALOHA):
+            raise ValueError(f"Modo de CSMA desconhecido: '{mode}'")
+        if not 0.0 < persistence <= 1.0:
+            raise ValueError("A persistência deve estar em (0, 1].")
+        if slot_time <= 0:
+            raise ValueError("O SlotTime deve ser positivo.")
+        self.mode = mode
+        self.persistence = persistence
+        self.slot_time = slot_time
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.backoff = 0
+        self.exponent = 0
+
+    def wait_for_clear_channel(self, sense_channel, sleep=time.sleep) -> int:
+        """
+        Laço de acesso em tempo real: a cada slot consulta sense_channel() (True = ocupado)
+        e espera slot_time até que should_transmit() libere a transmissão.
+        Retorna o número de slots esperados.
+        """
+        waited = 0
+        while not self.should_transmit(sense_channel()):
+            sleep(self.slot_time)
+            waited += 1
+        return waited
+
+    def apply_kiss_params(self, persistence_byte: int, slot_time_units: int):
+        """
+        Aplica os parâmetros KISS: P (0-255, p = (P + 1) / 256) e SlotTime (unidades de 10 ms).
+        SlotTime = 0 é tratado como MIN_SLOT_TIME_UNITS.
+        """
+        if not 0 <= persistence_byte <= 255 or not 0 <= slot_time_units <= 255:
+            raise ValueError("Os parâmetros KISS P e SlotTime devem estar em 0-255.")
+        self.persistence = (persistence_byte + 1) / 256
+        self.slot_time = max(slot_time_units, MIN_SLOT_TIME_UNITS) / 100
+
+    def should_transmit(self, busy: bool) -> bool:
+        """
+        Chamado uma vez por slot enquanto há um quadro a enviar.
+        Retorna True se o quadro deve ser transmitido neste slot.
+        """
+        if self.mode in (MODE_ALOHA, MODE_P_PERSISTENT):
+            if self.backoff:
+                self.backoff -= 1
+                return False
+            if self.mode == MODE_ALOHA:
+                return True
+            return not busy and self.rng.random() < self.persistence
+
+        # Exponencial
+        if self.backoff:
+            if not busy:
+                self.backoff -= 1
+            return False
+        if busy:
+            self._draw_backoff()
+            return False
+        return True
+
+    def _draw_backoff(self):
+        self.exponent = min(self.exponent + 1, MAX_BACKOFF_EXPONENT)
+        self.backoff = int(self.rng.integers(0, 2 ** self.exponent))
+
+    def on_success(self):
+        self.exponent = 0
+        self.backoff = 0
+
+    def on_collision(self):
+        """
+        Quadro perdido (sem confirmação): sorteia um backoff antes de retransmitir.
+        """
+        self._draw_backoff()
+
+# --- Simulação Multi-Estação ---
+
+def simulate_csma(n_stations: int, mode: str, slots: int = 20000, frame_slots: int = 9,
+                  load_per_station: float = 0.05, persistence: float = DEFAULT_PERSISTENCE,
+                  sense_delay: int = 1, seed: int = 0) -> dict:
+    """
+    Simulação slotada de N estações compartilhando o canal.
+
+    - Cada estação gera quadros (Poisson) com carga load_per_station (em quadros por
+      duração de quadro) e os enfileira;
+    - A escuta do canal enxerga as transmissões com sense_delay slots de atraso
+      (tempo de detecção do Goertzel + comutação TX/RX);
+    - Transmissões que se sobrepõem colidem e são retransmitidas após backoff.
+
+    Retorna: vazão (fração do tempo com quadros entregues), taxa de colisão e atraso médio.
+    """
+    rng = np.random.default_rng(seed)
+    macs = [CsmaMac(mode, persistence, rng=rng) for _ in range(n_stations)]
+    queues = [[] for _ in range(n_stations)]  # Instantes de chegada dos quadros
+    tx_end = [-1] * n_stations  # Último slot da transmissão em andamento
+    tx_collided = [False] * n_stations
+    busy_history = [0] * (slots + sense_delay + 1)  # Nº de estações transmitindo por slot
+    arrival_p = load_per_station / frame_slots
+
+    delivered = 0
+    attempts = 0
+    collisions = 0
+    total_delay = 0
+
+    for t in range(slots):
+        arrivals = rng.random(n_stations) < arrival_p
+        for i in np.nonzero(arrivals)[0]:
+            queues[i].append(t)
+
+        sensed_busy = busy_history[t - sense_delay] > 0 if t >= sense_delay else False
+        active = [i for i in range(n_stations) if tx_end[i] >= t]
+
+        starters = []
+        for i in range(n_stations):
+            if tx_end[i] >= t or not queues[i]:
+                continue
+            if macs[i].should_transmit(sensed_busy):
+                starters.append(i)
+
+        for i in starters:
+            tx_end[i] = t + frame_slots - 1
+            tx_collided[i] = False
+            attempts += 1
+        if len(starters) + len(active) > 1:
+            for i in starters + active:
+                tx_collided[i] = True
+
+        for s in range(t, t + frame_slots):
+            if s < len(busy_history):
+                busy_history[s] += len(starters)
+
+        # Fim de transmissão neste slot
+        for i in range(n_stations):
+            if tx_end[i] == t:
+                if tx_collided[i]:
+                    collisions += 1
+                    macs[i].on_collision()
+                else:
+                    delivered += 1
+                    total_delay += t - queues[i].pop(0)
+                    macs[i].on_success()
+
+    return {
+        "stations": n_stations,
+        "offered_load": n_stations * load_per_station,
+        "throughput": delivered * frame_slots / slots,
+        "collision_rate": collisions / attempts if attempts else 0.0,
+        "mean_delay_slots": total_delay / delivered if delivered else float('inf'),
+    }
+
+if __name__ == '__main__':
+    from afsk_tx import build_packet, modulate_packet
+
+    # Detector: ruído sozinho x quadro AFSK com ruído
+    rng = np.random.default_rng(0)
+    frame = modulate_packet(build_packet("TEMP=23.5", 10, 20))
+    noise = rng.normal(0, 0.02, len(frame))
+    print(f"Canal livre (ruído): ocupado={CarrierSense().feed(noise)}")
+    print(f"Quadro no ar:        ocupado={CarrierSense().feed(frame + noise)}")
+
+    # RX parado no meio de um quadro: a detecção expira em vez de ocupar o canal para sempre
+    now = [0.0]
+    sensor = CarrierSense(clock=lambda: now[0])
+    sensor.feed(frame[:len(frame) // 2] + noise[:len(frame) // 2])
+    now[0] += CARRIER_STALE_SECONDS + 0.1
+    print(f"RX parado há {now[0]:.1f}s:  ocupado={sensor.busy}")
+    assert not sensor.busy
+
+    # SlotTime = 0 vindo de um cliente KISS não zera o slot
+    mac = CsmaMac()
+    mac.apply_kiss_params(63, 0)
+    print(f"KISS SlotTime=0 -> slot de {1000 * mac.slot_time:.0f} ms")
+    assert mac.slot_time > 0
+
+    # Vazão e colisões com o número de estações crescendo (carga fixa por estação)
+    # Quadro de ~0.9 s em slots de 100 ms => 9 slots por quadro
+    print("\nEstações | carga | modo           | vazão | colisões | atraso médio (slots)")
+    for n in (1, 2, 4, 8, 16):
+        for mode in (MODE_ALOHA, MODE_P_PERSISTENT, MODE_EXPONENTIAL):
+            stats = simulate_csma(n, mode, load_per_station=0.08)
+            print(f"{n:8d} | {stats['offered_load']:5.2f} | {mode:14} | {stats['throughput']:5.2f} | "
+                  f"{100 * stats['collision_rate']:7.1f}% | {stats['mean_delay_slots']:8.1f}")
@@ -0,0 +1,263 @@
+import os
+import sys
+import struct
+import hashlib
+import argparse
+from typing import NamedTuple
+import numpy as np
+from afsk_utils import FS
+from afsk_resample import iter_resampled, resample_to_profile
+from afsk_stream import FrameDecoder
+from afsk_wavio import PcmStreamReader
+from afsk_payload import decode_payload, format_payload
+
+# --- Formato do Índice (sidecar) ---
+# Cabeçalho: magic, versão, FS da gravação, tamanho do arquivo, mtime (ns), SHA-256, nº de entradas
+# Entrada: offset (amostras), comprimento (amostras), ID TX, ID RX, Len, CRC OK, hash do payload
+INDEX_SUFFIX = '.afskidx'
+INDEX_MAGIC = b'AFSKIDX1'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<8sHIQq32sI')
+INDEX_ENTRY = struct.Struct('<QIBBBB8s')
+HASH_BLOCK_SIZE = 1024 * 1024
+
+class IndexEntry(NamedTuple):
+    """
+    Entrada do índice. offset/length estão em amostras na taxa original da gravação.
+    """
+    offset: int
+    length: int
+    id_tx: int
+    id_rx: int
+    payload_len: int
+    crc_ok: bool
+    payload_hash: bytes
+
+# --- Funções Auxiliares ---
+
+def index_path(filename: str) -> str:
+    """
+    Caminho do índice sidecar de uma gravação (ex.: 'arquivo.wav.afskidx').
+    """
+    return filename + INDEX_SUFFIX
+
+def file_sha256(filename: str) -> bytes:
+    """
+    SHA-256 do conteúdo do arquivo, lido em blocos (memória constante).
+    """
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            h.update(block)
+    return h.digest()
+
+def payload_hash(payload: bytes) -> bytes:
+    """
+    Hash curto (8 bytes) do payload, para deduplicação e busca de mensagens.
+    """
+    return hashlib.blake2b(payload, digest_size=8).digest()
+
+# --- Varredura e Persistência ---
+
+def scan_recording(filename: str) -> tuple[int, list[IndexEntry]]:
+    """
+    Demodula a gravação inteira uma única vez (em streaming) e lista todos os quadros,
+    independentemente do endereçamento.
+
+    Retorna: (fs_da_gravacao, entradas)
+    """
+    entries = []
+    decoder = FrameDecoder()
+    with PcmStreamReader(filename) as reader:
+        fs_in = reader.fs
+        for chunk in iter_resampled(reader, fs_in, FS):
+            for frame in decoder.feed(chunk):
+                # Converte as posições da taxa FS para a taxa original da gravação
+                offset = frame.start_sample * fs_in // FS
+                length = -(-frame.num_samples * fs_in // FS)
+                entries.append(IndexEntry(offset, length, frame.id_tx, frame.id_rx,
+                                          len(frame.payload), frame.crc_ok, payload_hash(frame.payload)))
+    return fs_in, entries
+
+def write_index(filename: str, fs_in: int, entries: list[IndexEntry], digest: bytes = None) -> str:
+    """
+    Grava o índice sidecar ao lado da gravação. Retorna o caminho do índice.
+    """
+    stat = os.stat(filename)
+    if digest is None:
+        digest = file_sha256(filename)
+    path = index_path(filename)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, fs_in, stat.st_size, stat.st_mtime_ns,
+                                  digest, len(entries)))
+        for e in entries:
+            f.write(INDEX_ENTRY.pack(e.offset, e.length, e.id_tx, e.id_rx, e.payload_len,
+                                     int(e.crc_ok), e.payload_hash))
+    # Substituição atômica: um índice parcial nunca é lido
+    os.replace(tmp_path, path)
+    return path
+
+def load_index(filename: str) -> tuple[int, list[IndexEntry]] | None:
+    """
+    Lê o índice sidecar, se existir e ainda corresponder à gravação.
+
+    A validação é feita pelo tamanho e mtime do arquivo; se apenas o mtime mudou,
+    o SHA-256 é recalculado para confirmar que o conteúdo é o mesmo.
+
+    Retorna: (fs_da_gravacao, entradas), ou None se o índice não existir ou estiver desatualizado.
+    """
+    path = index_path(filename)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    if len(data) < INDEX_HEADER.size:
+        return None
+    magic, version, fs_in, size, mtime_ns, digest, count = INDEX_HEADER.unpack_from(data)
+    if magic != INDEX_MAGIC or version != INDEX_VERSION:
+        return None
+    if len(data) != INDEX_HEADER.size + count * INDEX_ENTRY.size:
+        return None
+
+    stat = os.stat(filename)
+    if stat.st_size != size:
+        return None
+    touched = stat.st_mtime_ns != mtime_ns
+    if touched and file_sha256(filename) != digest:
+        return None
+
+    entries = [
+        IndexEntry(offset, length, id_tx, id_rx, payload_len, bool(crc_ok), p_hash)
+        for offset, length, id_tx, id_rx, payload_len, crc_ok, p_hash
+        in INDEX_ENTRY.iter_unpack(data[INDEX_HEADER.size:])
+    ]
+    if touched:
+        # Mesmo conteúdo com novo mtime (touch, cópia, rsync): atualiza o sidecar
+        # para que as próximas consultas não recalculem o SHA-256
+        write_index(filename, fs_in, entries, digest)
+    return fs_in, entries
+
+def get_index(filename: str, rebuild: bool = False) -> tuple[int, list[IndexEntry]]:
+    """
+    Retorna o índice da gravação, varrendo o arquivo (e gravando o sidecar)
+    apenas se o índice não existir, estiver desatualizado ou rebuild=True.
+    """
+    if not rebuild:
+        cached = load_index(filename)
+        if cached is not None:
+            return cached
+    fs_in, entries = scan_recording(filename)
+    write_index(filename, fs_in, entries)
+    return fs_in, entries
+
+# --- Consultas ---
+
+def query_index(entries: list[IndexEntry], fs_in: int, id_rx: int = None, id_tx: int = None,
+                start_seconds: float = None, end_seconds: float = None,
+                crc_ok: bool = None) -> list[IndexEntry]:
+    """
+    Filtra as entradas do índice por ID, intervalo de tempo (início do quadro) e status do CRC.
+    """
+    result = []
+    for e in entries:
+        t = e.offset / fs_in
+        if id_rx is not None and e.id_rx != id_rx:
+            continue
+        if id_tx is not None and e.id_tx != id_tx:
+            continue
+        if start_seconds is not None and t < start_seconds:
+            continue
+        if end_seconds is not None and t >= end_seconds:
+            continue
+        if crc_ok is not None and e.crc_ok != crc_ok:
+            continue
+        result.append(e)
+    return result
+
+def extract_frame(filename: str, entry: IndexEntry) -> tuple[int, np.ndarray]:
+    """
+    Lê apenas as amostras do quadro, com seek direto no WAV (sem demodular o resto).
+    Usa o mesmo leitor da varredura, então aceita os mesmos arquivos (inclusive
+    WAVE_FORMAT_EXTENSIBLE).
+
+    Retorna: (fs_da_gravacao, amostras_float64)
+    """
+    chunks = []
+    got = 0
+    with PcmStreamReader(filename, chunk_samples=entry.length) as reader:
+        reader.seek(entry.offset)
+        for chunk in reader:
+            chunks.append(chunk)
+            got += len(chunk)
+            if got >= entry.length:
+                break
+        fs_in = reader.fs
+    samples = np.concatenate(chunks)[:entry.length] if chunks else np.array([], dtype=np.float64)
+    return fs_in, samples
+
+def _matches_entry(frame, entry: IndexEntry) -> bool:
+    if (frame.id_tx, frame.id_rx, len(frame.payload)) != (entry.id_tx, entry.id_rx, entry.payload_len):
+        return False
+    # Payload com CRC inválido pode não se repetir byte a byte ao re-demodular
+    return not entry.crc_ok or (frame.crc_ok and payload_hash(frame.payload) == entry.payload_hash)
+
+def decode_frame(filename: str, entry: IndexEntry, binary: bool = False) -> tuple[bytes, bool]:
+    """
+    Re-demodula um único quadro a partir do índice e confere que é o quadro da
+    entrada (IDs, Len e hash do payload). Com binary=True, o Payload é decodificado
+    pelo modo binário (afsk_payload).
+
+    Retorna: (payload, crc_ok). Lança ValueError se o quadro não corresponder à entrada.
+    """
+    fs_in, samples = extract_frame(filename, entry)
+    audio = resample_to_profile(samples, fs_in, FS)
+    # Folga no final para absorver o arredondamento de offset/comprimento
+    frames = FrameDecoder().feed(np.concatenate((audio, np.zeros(FS // 100))))
+    frame = next((frame for frame in frames if _matches_entry(frame, entry)), None)
+    if frame is None:
+        raise ValueError(f"O quadro na amostra {entry.offset} não corresponde à entrada do índice.")
+    if binary and frame.crc_ok:
+        return decode_payload(frame.payload), True
+    return frame.payload, frame.crc_ok
+
+# --- Interface de Linha de Comando ---
+
+def main(argv=None):
+    """
+    Uso:
+        python afsk_index.py scan gravacao.wav
+        python afsk_index.py query gravacao.wav --rx-id 20 --from 1800 --to 2400 --decode
+    """
+    parser = argparse.ArgumentParser(description="Índice sidecar de quadros AFSK em gravações.")
+    parser.add_argument("command", choices=("scan", "query"))
+    parser.add_argument("filename")
+    parser.add_argument("--rebuild", action="store_true", help="Ignora o índice existente")
+    parser.add_argument("--rx-id", type=int)
+    parser.add_argument("--tx-id", type=int)
+    parser.add_argument("--from", dest="start", type=float, help="Início (s)")
+    parser.add_argument("--to", dest="end", type=float, help="Fim (s)")
+    parser.add_argument("--decode", action="store_true", help="Re-demodula os quadros encontrados")
+    parser.add_argument("--binary", action="store_true", help="Payload no modo binário (com compressão)")
+    args = parser.parse_args(argv)
+
+    fs_in, entries = get_index(args.filename, rebuild=args.rebuild or args.command == "scan")
+    if args.command == "scan":
+        print(f"Índice gravado em '{index_path(args.filename)}': {len(entries)} quadros.")
+        return
+
+    for e in query_index(entries, fs_in, args.rx_id, args.tx_id, args.start, args.end):
+        line = (f"{e.offset / fs_in:10.3f}s  TX {e.id_tx:3d} -> RX {e.id_rx:3d}  "
+                f"Len {e.payload_len:3d}  CRC {'OK' if e.crc_ok else 'ERRO'}")
+        if args.decode:
+            try:
+                payload, _ = decode_frame(args.filename, e, args.binary)
+                line += f"  '{format_payload(payload)}'"
+            except ValueError as err:
+                line += f"  (erro: {err})"
+        print(line)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,519 @@
+import os
+import queue
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+import argparse
+import numpy as np
+from afsk_tx import build_packet, modulate_packet_into, BIT_WAVEFORMS_INT16
+from afsk_tx_pipeline import MAX_FRAME_SAMPLES
+from afsk_utils import FS, BAUD_RATE, SAMPLES_PER_BIT, signal_to_int16
+from afsk_resample import iter_resampled
+from afsk_stream import FrameDecoder
+from afsk_wavio import PcmStreamReader, PcmStreamWriter
+from afsk_csma import CarrierSense, CsmaMac
+from afsk_payload import encode_payload, decode_payload
+from afsk_rate import AdaptiveDecoder, RateController, build_adaptive_frame, MAX_ADAPTIVE_FRAME_SAMPLES
+
+# --- Protocolo KISS ---
+FEND = 0xC0  # Delimitador de quadro
+FESC = 0xDB  # Escape
+TFEND = 0xDC  # FEND transposto
+TFESC = 0xDD  # FESC transposto
+
+CMD_DATA = 0x00
+CMD_TXDELAY = 0x01
+CMD_PERSISTENCE = 0x02
+CMD_SLOTTIME = 0x03
+CMD_TXTAIL = 0x04
+CMD_FULLDUPLEX = 0x05
+CMD_SETHARDWARE = 0x06
+CMD_RETURN = 0xFF
+
+# Conteúdo de um quadro de dados KISS neste modem: [ID TX (1)] [ID RX (1)] [Payload (0-255)]
+# Preamble, Sync Word, Len e CRC são inseridos/verificados pelo próprio modem.
+KISS_ADDRESS_LEN = 2
+MAX_KISS_FRAME = KISS_ADDRESS_LEN + 255
+
+DEFAULT_TCP_PORT = 8001
+TX_BATCH_MAX = 32  # Quadros agrupados em uma única escrita no backend de áudio
+KISS_TIME_UNIT = 0.010  # TXDELAY e TXtail são dados em unidades de 10 ms
+MAX_KEYING_SAMPLES = int(255 * KISS_TIME_UNIT * BAUD_RATE) * SAMPLES_PER_BIT  # TXDELAY/TXtail máximo
+CLIENT_QUEUE_MAX = 256  # Quadros de RX pendentes por cliente antes de desconectá-lo
+
+def kiss_escape(data: bytes) -> bytes:
+    return data.replace(bytes([FESC]), bytes([FESC, TFESC])).replace(bytes([FEND]), bytes([FESC, TFEND]))
+
+def keying_bits(units: int) -> np.ndarray:
+    """
+    Bits alternados (padrão do Preamble, 1010...) que preenchem units x 10 ms de TXDELAY
+    ou TXtail: mantêm o transmissor (PTT/VOX) chaveado e o receptor remoto em sincronia.
+    """
+    n_bits = int(units * KISS_TIME_UNIT * BAUD_RATE)
+    return (np.arange(n_bits) % 2 == 0).astype(np.uint8)
+
+def kiss_encode(data: bytes, port: int = 0, command: int = CMD_DATA) -> bytes:
+    """
+    Monta um quadro KISS: FEND [porta|comando] dados(escapados) FEND.
+    """
+    return bytes([FEND, (port & 0x0F) << 4 | (command & 0x0F)]) + kiss_escape(data) + bytes([FEND])
+
+class KissDecoder:
+    """
+    Parser incremental de KISS: aceita bytes em qualquer fragmentação (vários quadros
+    por recv, quadros partidos entre recvs) e devolve os quadros completos.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._in_frame = False
+        self._escape = False
+
+    def feed(self, data: bytes) -> list[tuple[int, int, bytes]]:
+        """
+        Retorna: lista de (porta, comando, dados).
+        """
+        frames = []
+        for byte in data:
+            if byte == FEND:
+                if self._in_frame and self._buffer:
+                    type_byte = self._buffer[0]
+                    command = CMD_RETURN if type_byte == CMD_RETURN else type_byte & 0x0F
+                    frames.append((type_byte >> 4, command, bytes(self._buffer[1:])))
+                self._buffer.clear()
+                self._in_frame = True
+                self._escape = False
+            elif not self._in_frame:
+                continue
+            elif self._escape:
+                self._buffer.append(FEND if byte == TFEND else FESC if byte == TFESC else byte)
+                self._escape = False
+            elif byte == FESC:
+                self._escape = True
+            else:
+                self._buffer.append(byte)
+        return frames
+
+# --- Backends de Áudio ---
+
+class LoopbackBackend:
+    """
+    Backend de teste local: o áudio transmitido é entregue diretamente ao receptor
+    do próprio TNC (como se TX e RX estivessem ligados por um cabo).
+    """
+
+    shares_channel = False  # Sem canal compartilhado: o CSMA não se aplica
+
+    def __init__(self):
+        self.on_audio = None
+
+    def start(self, on_audio):
+        self.on_audio = on_audio
+
+    def transmit(self, signal: np.ndarray):
+        self.on_audio(signal.astype(np.float64) / 32767.0)
+
+    def close(self):
+        pass
+
+class FileBackend:
+    """
+    Backend de arquivos: TX é gravado em streaming em um WAV (ou stdout/socket) e,
+    opcionalmente, RX é lido de outro WAV/stdin/socket em uma thread.
+    """
+
+    def __init__(self, tx_target, rx_source=None):
+        self.tx_target = tx_target
+        self.rx_source = rx_source
+        self.shares_channel = rx_source is not None  # Só há o que escutar com RX ativo
+        self._writer = None
+        self._rx_thread = None
+
+    def start(self, on_audio):
+        self._writer = PcmStreamWriter(self.tx_target)
+        if self.rx_source is not None:
+            self._rx_thread = threading.Thread(target=self._rx_loop, args=(on_audio,), daemon=True)
+            self._rx_thread.start()
+
+    def _rx_loop(self, on_audio):
+        with PcmStreamReader(self.rx_source) as reader:
+            for chunk in iter_resampled(reader, reader.fs, FS):
+                on_audio(chunk)
+        # Fim da entrada: não há mais canal para escutar
+        self.shares_channel = False
+
+    def transmit(self, signal: np.ndarray):
+        self._writer.write(signal)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+# --- Servidor (TNC) ---
+
+class _KissClient:
+    """
+    Cliente conectado: os quadros de RX entram em uma fila própria, esvaziada por uma
+    thread de envio. Assim, um cliente lento não atrasa os outros nem a thread de RX;
+    se a fila dele encher, ele é desconectado.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._queue = queue.Queue(maxsize=CLIENT_QUEUE_MAX)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._send_loop, name="afsk-kiss-client", daemon=True)
+        self._thread.start()
+
+    def send(self, kiss_frame: bytes) -> bool:
+        """
+        Enfileira um quadro sem bloquear. Retorna False se o cliente foi (ou já estava) desconectado.
+        """
+        if self._closed.is_set():
+            return False
+        try:
+            self._queue.put_nowait(kiss_frame)
+        except queue.Full:
+            print("[KISS] Cliente lento desconectado (fila de saída cheia).", file=sys.stderr)
+            self.close()
+            return False
+        return True
+
+    def _send_loop(self):
+        while not self._closed.is_set():
+            kiss_frame = self._queue.get()
+            if kiss_frame is None:
+                break
+            try:
+                self.sock.sendall(kiss_frame)
+            except OSError:
+                self.close()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        # shutdown acorda o recv do handler e um sendall bloqueado na thread de envio
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+class _KissClientHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        tnc = self.server.tnc
+        client = tnc._add_client(self.request)
+        decoder = KissDecoder()
+        try:
+            while True:
+                data = self.request.recv(65536)
+                if not data:
+                    break
+                # Todos os quadros de um recv entram na fila de uma vez (lotes sem ida e volta)
+                tnc._handle_kiss_frames(decoder.feed(data))
+        except OSError:
+            pass
+        finally:
+            tnc._remove_client(client)
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _ThreadingUnixServer(socketserver.ThreadingUnixStreamServer):
+        """
+        Servidor em socket Unix que remove o arquivo do socket ao encerrar e, ao
+        iniciar, apaga um socket órfão deixado por um TNC que não encerrou limpo.
+        """
+        daemon_threads = True
+        _bound = False
+
+        def server_bind(self):
+            _remove_stale_socket(self.server_address)
+            super().server_bind()
+            self._bound = True
+
+        def server_close(self):
+            super().server_close()
+            # Só apaga o arquivo se foi este servidor que o criou (bind com falha também fecha)
+            if self._bound:
+                self._bound = False
+                try:
+                    os.unlink(self.server_address)
+                except FileNotFoundError:
+                    pass
+
+def _remove_stale_socket(path: str):
+    """
+    Apaga o socket Unix em path se ninguém estiver escutando nele.
+    Recusa caminhos que não são sockets e sockets ainda em uso.
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"'{path}' existe e não é um socket Unix.")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise ValueError(f"Já existe um TNC escutando em '{path}'.")
+
+class KissTnc:
+    """
+    Daemon TNC compatível com KISS sobre TCP ou socket Unix.
+
+    - Vários clientes simultâneos;
+    - Quadros de dados recebidos dos clientes vão para a fila de TX e são modulados
+      em lotes (um único envio ao backend por lote);
+    - Antes de cada lote, o acesso ao canal segue o CSMA p-persistente com os
+      parâmetros KISS P e SlotTime (exceto em FullDuplex ou sem RX no backend);
+    - Cada lote é precedido de TXDELAY x 10 ms e seguido de TXtail x 10 ms de bits
+      alternados (padrão do Preamble);
+    - Quadros demodulados com CRC válido são enviados a todos os clientes conectados,
+      cada um pela sua própria fila (um cliente lento é desconectado sem atrasar os outros).
+
+    Com binary=True, os Payloads vão ao ar no modo binário (afsk_payload): o TNC
+    comprime na transmissão e entrega aos clientes os bytes já decodificados.
+
+    Com adaptive=True, o TNC usa o quadro adaptativo (afsk_rate): o RateController mede
+    a margem F0/F1 dos quadros de cada par e recomenda um degrau no campo Rate dos
+    quadros que enviamos a ele; cada quadro sai no degrau que o destinatário recomendou
+    (difusões ficam na taxa base). Sem ACKs no KISS, quadros perdidos não são detectados:
+    a taxa só desce pelas recomendações do par.
+    """
+
+    def __init__(self, backend, tcp_port: int = None, host: str = '127.0.0.1', unix_path: str = None,
+                 binary: bool = False, adaptive: bool = False):
+        if (tcp_port is None) == (unix_path is None):
+            raise ValueError("Informe exatamente um endereço: porta TCP ou caminho Unix.")
+        self.backend = backend
+        self.binary = binary
+        self.rate = RateController() if adaptive else None
+        self.params = {CMD_TXDELAY: 50, CMD_PERSISTENCE: 63, CMD_SLOTTIME: 10, CMD_TXTAIL: 0, CMD_FULLDUPLEX: 0}
+        self.frames_queued = 0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.frames_received = 0
+
+        self._tx_queue = queue.Queue()
+        self._clients = []
+        self._clients_lock = threading.Lock()
+        self._rx_lock = threading.Lock()
+        self._rx_decoder = AdaptiveDecoder() if adaptive else FrameDecoder()
+        self._carrier = CarrierSense()
+        self._mac = CsmaMac()
+        max_frame = MAX_ADAPTIVE_FRAME_SAMPLES if adaptive else MAX_FRAME_SAMPLES
+        self._tx_buffer = np.zeros(max_frame * TX_BATCH_MAX + 2 * MAX_KEYING_SAMPLES, dtype=np.int16)
+
+        if unix_path is not None:
+            self.server = _ThreadingUnixServer(unix_path, _KissClientHandler)
+        else:
+            self.server = _ThreadingTCPServer((host, tcp_port), _KissClientHandler)
+        self.server.tnc = self
+        self.address = self.server.server_address
+        self._tx_thread = threading.Thread(target=self._tx_loop, name="afsk-kiss-tx", daemon=True)
+        self._server_thread = None
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        """
+        Inicia o servidor em segundo plano.
+        """
+        self.backend.start(self._on_audio)
+        self._tx_thread.start()
+        self._server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._server_thread.start()
+
+    def serve_forever(self):
+        self.backend.start(self._on_audio)
+        self._tx_thread.start()
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self._tx_queue.put(None)
+        self._tx_thread.join()
+        self.server.shutdown()
+        self.server.server_close()
+        with self._clients_lock:
+            for client in self._clients:
+                client.close()
+            self._clients.clear()
+        self.backend.close()
+
+    def wait_tx_idle(self):
+        """
+        Espera até que todos os quadros enfileirados tenham sido transmitidos.
+        """
+        self._tx_queue.join()
+
+    # --- Clientes ---
+
+    def _add_client(self, sock) -> _KissClient:
+        client = _KissClient(sock)
+        with self._clients_lock:
+            self._clients.append(client)
+        return client
+
+    def _remove_client(self, client: _KissClient):
+        client.close()
+        with self._clients_lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def _handle_kiss_frames(self, frames):
+        for port, command, data in frames:
+            if command == CMD_DATA:
+                if KISS_ADDRESS_LEN <= len(data) <= MAX_KISS_FRAME:
+                    self.frames_queued += 1
+                    self._tx_queue.put(data)
+            elif command in self.params and data:
+                self.params[command] = data[0]
+
+    def _broadcast(self, kiss_frame: bytes):
+        with self._clients_lock:
+            clients = list(self._clients)
+        for client in clients:
+            if not client.send(kiss_frame):
+                self._remove_client(client)
+
+    # --- Modem ---
+
+    def _tx_loop(self):
+        while True:
+            item = self._tx_queue.get()
+            if item is None:
+                self._tx_queue.task_done()
+                break
+            batch = [item]
+            # Agrupa o que já estiver na fila: um único envio de áudio por lote
+            while len(batch) < TX_BATCH_MAX:
+                try:
+                    item = self._tx_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._tx_queue.put(None)
+                    self._tx_queue.task_done()
+                    break
+                batch.append(item)
+
+            self._acquire_channel()
+            n = self._write_keying(self.params[CMD_TXDELAY], 0)
+            sent = 0
+            for data in batch:
+                try:
+                    payload = data[KISS_ADDRESS_LEN:]
+                    if self.binary:
+                        payload = encode_payload(payload)
+                    if self.rate is not None:
+                        n += self._modulate_adaptive(payload, data[0], data[1], n)
+                    else:
+                        n += modulate_packet_into(build_packet(payload, data[0], data[1]), self._tx_buffer[n:])
+                    sent += 1
+                except ValueError as e:
+                    self.frames_dropped += 1
+                    print(f"[KISS] Quadro descartado: {e}", file=sys.stderr)
+            if sent:
+                n = self._write_keying(self.params[CMD_TXTAIL], n)
+                self.backend.transmit(self._tx_buffer[:n])
+            self.frames_sent += sent
+            for _ in batch:
+                self._tx_queue.task_done()
+
+    def _modulate_adaptive(self, payload: bytes, id_tx: int, id_rx: int, n: int) -> int:
+        """
+        Modula um quadro adaptativo em _tx_buffer a partir de n, no degrau recomendado
+        pelo destinatário e levando a nossa recomendação para ele.
+        Retorna: número de amostras escritas.
+        """
+        signal = build_adaptive_frame(payload, id_tx, id_rx, self.rate.tx_config(id_rx),
+                                      self.rate.recommendation_for(id_rx))
+        self._tx_buffer[n:n + len(signal)] = signal_to_int16(signal)
+        return len(signal)
+
+    def _write_keying(self, units: int, n: int) -> int:
+        """
+        Escreve o TXDELAY/TXtail (bits alternados) em _tx_buffer a partir de n.
+        Retorna: a nova posição de escrita.
+        """
+        bits = keying_bits(units)
+        end = n + len(bits) * SAMPLES_PER_BIT
+        self._tx_buffer[n:end].reshape(len(bits), SAMPLES_PER_BIT)[:] = BIT_WAVEFORMS_INT16[bits]
+        return end
+
+    def _acquire_channel(self):
+        if self.params[CMD_FULLDUPLEX] or not self.backend.shares_channel:
+            return
+        self._mac.apply_kiss_params(self.params[CMD_PERSISTENCE], self.params[CMD_SLOTTIME])
+        self._mac.wait_for_clear_channel(lambda: self._carrier.busy and self.backend.shares_channel, time.sleep)
+        self._mac.on_success()
+
+    def _on_audio(self, samples: np.ndarray):
+        with self._rx_lock:
+            self._carrier.feed(samples)
+            frames = self._rx_decoder.feed(samples)
+            if self.rate is not None:
+                for frame in frames:
+                    self.rate.on_frame(frame)
+        for frame in frames:
+            if not frame.crc_ok:
+                continue
+            payload = frame.payload
+            if self.binary:
+                try:
+                    payload = decode_payload(payload)
+                except ValueError as e:
+                    print(f"[KISS] Payload binário inválido: {e}", file=sys.stderr)
+                    continue
+            self.frames_received += 1
+            self._broadcast(kiss_encode(bytes([frame.id_tx, frame.id_rx]) + payload))
+
+# --- Interface de Linha de Comando ---
+
+def main(argv=None):
+    """
+    Uso:
+        python afsk_kiss.py --tcp 8001 --loopback
+        python afsk_kiss.py --unix /tmp/afsk.sock --tx-file saida.wav --rx-file entrada.wav
+    """
+    parser = argparse.ArgumentParser(description="Daemon TNC KISS para o modem AFSK.")
+    addr = parser.add_mutually_exclusive_group()
+    addr.add_argument("--tcp", type=int, default=None, help=f"Porta TCP (padrão: {DEFAULT_TCP_PORT})")
+    addr.add_argument("--unix", default=None, help="Caminho do socket Unix")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--loopback", action="store_true", help="TX é entregue ao próprio RX (teste local)")
+    parser.add_argument("--tx-file", default="kiss_tx.wav", help="Destino do áudio de TX (arquivo, '-' ou tcp:HOST:PORTA)")
+    parser.add_argument("--binary", action="store_true", help="Payload no modo binário (com compressão)")
+    parser.add_argument("--adaptive", action="store_true", help="Quadro adaptativo com adaptação de taxa por par")
+    parser.add_argument("--rx-file", default=None, help="Origem do áudio de RX (arquivo, '-' ou tcp:HOST:PORTA)")
+    args = parser.parse_args(argv)
+
+    backend = LoopbackBackend() if args.loopback else FileBackend(args.tx_file, args.rx_file)
+    tcp_port = args.tcp if args.tcp is not None or args.unix else DEFAULT_TCP_PORT
+    tnc = KissTnc(backend, tcp_port=tcp_port, host=args.host, unix_path=args.unix, binary=args.binary,
+                  adaptive=args.adaptive)
+    print(f"[KISS] TNC escutando em {tnc.address}", file=sys.stderr)
+    try:
+        tnc.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[KISS] Encerrando.", file=sys.stderr)
+    finally:
+        tnc.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import heapq
+import zlib
+from afsk_utils import BAUD_RATE
+
+# --- Formato do Payload Binário ---
+# No modo binário, o primeiro byte do Payload indica a codificação do restante:
+# [Codec (1)] [Dados codificados (0-254)]
+# O byte de codec é contado em Len e coberto pelo CRC, como qualquer byte do Payload.
+CODEC_RAW = 0x00  # Bytes sem compressão
+CODEC_DEFLATE = 0x01  # DEFLATE (zlib sem cabeçalho) com dicionário pré-definido
+CODEC_HUFFMAN = 0x02  # Huffman estático para textos curtos
+MAX_ENCODED_LEN = 255 - 1  # Len máximo menos o byte de codec
+
+# Dicionário pré-definido do DEFLATE: vocabulário comum das nossas mensagens de telemetria.
+# Os termos mais frequentes ficam no final (distâncias menores -> códigos mais curtos).
+DEFLATE_DICTIONARY = (
+    b"ALERTA ERRO FALHA REINICIO BEACON PING PONG ACK NACK "
+    b"LAT=-LON=-ALT=VEL=DIR=RSSI=SNR=UPTIME=SEQ=ID= "
+    b"STATUS=OK STATUS=ERRO BAT=V;TEMP=C;HUM=%;PRESS=hPa;"
+    b"0.0 1.1 2.2 3.3 4.4 5.5 6.6 7.7 8.8 9.9 "
+    b"TEMP=25.0;HUM=60;BAT=3.70;STATUS=OK;"
+)
+DEFLATE_LEVEL = 9
+
+# Pesos do Huffman estático (frequências relativas em mensagens de telemetria/texto curto).
+# Bytes fora da tabela recebem peso 1 e continuam codificáveis (códigos mais longos).
+HUFFMAN_WEIGHTS = {
+    **{ord(c): 60 for c in "0123456789"},
+    **{ord(c): 30 for c in "=;.,: "},
+    **{ord(c): 20 for c in "ETAOSRNIDLCUMHPBV"},
+    **{ord(c): 8 for c in "GFQXJKWYZ-+%/"},
+    **{ord(c): 6 for c in "etaosrnidlcumhp"},
+    **{ord(c): 2 for c in "bvgfqxjkwyz!?()_#\n"},
+}
+HUFFMAN_EOF = 256  # Símbolo de fim de mensagem (dispensa um campo de comprimento)
+
+# --- Huffman Estático ---
+
+def _build_huffman_code(weights: dict) -> dict:
+    """
+    Constrói um código de Huffman canônico para os 256 bytes + EOF.
+    Retorna: {símbolo: (código, comprimento_em_bits)}
+    """
+    symbols = list(range(256)) + [HUFFMAN_EOF]
+    heap = [(weights.get(s, 1), s, [s]) for s in symbols]
+    heapq.heapify(heap)
+    lengths = {s: 0 for s in symbols}
+    tie = 257
+    while len(heap) > 1:
+        w1, _, group1 = heapq.heappop(heap)
+        w2, _, group2 = heapq.heappop(heap)
+        for s in group1 + group2:
+            lengths[s] += 1
+        heapq.heappush(heap, (w1 + w2, tie, group1 + group2))
+        tie += 1
+
+    # Atribuição canônica: ordenada por (comprimento, símbolo)
+    code = {}
+    value = 0
+    prev_len = 0
+    for s in sorted(symbols, key=lambda s: (lengths[s], s)):
+        value <<= lengths[s] - prev_len
+        code[s] = (value, lengths[s])
+        prev_len = lengths[s]
+        value += 1
+    return code
+
+HUFFMAN_CODE = _build_huffman_code(HUFFMAN_WEIGHTS)
+HUFFMAN_DECODE = {(length, value): s for s, (value, length) in HUFFMAN_CODE.items()}
+
+def huffman_encode(data: bytes) -> bytes:
+    """
+    Codifica os bytes com a tabela estática (MSB-first), terminando com EOF.
+    """
+    acc = 0
+    n_bits = 0
+    for s in list(data) + [HUFFMAN_EOF]:
+        value, length = HUFFMAN_CODE[s]
+        acc = (acc << length) | value
+        n_bits += length
+    pad = (-n_bits) % 8
+    return (acc << pad).to_bytes((n_bits + pad) // 8, byteorder='big')
+
+def huffman_decode(encoded: bytes) -> bytes:
+    """
+    Decodifica um bloco produzido por huffman_encode.
+    """
+    out = bytearray()
+    value = 0
+    length = 0
+    for byte in encoded:
+        for i in range(7, -1, -1):
+            value = (value << 1) | ((byte >> i) & 1)
+            length += 1
+            s = HUFFMAN_DECODE.get((length, value))
+            if s is None:
+                continue
+            if s == HUFFMAN_EOF:
+                return bytes(out)
+            out.append(s)
+            value = 0
+            length = 0
+    raise ValueError("Payload Huffman sem o símbolo de fim (EOF).")
+
+# --- DEFLATE com Dicionário ---
+
+def deflate_encode(data: bytes) -> bytes:
+    compressor = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15, zdict=DEFLATE_DICTIONARY)
+    return compressor.compress(data) + compressor.flush()
+
+def deflate_decode(encoded: bytes) -> bytes:
+    decompressor = zlib.decompressobj(-15, zdict=DEFLATE_DICTIONARY)
+    return decompressor.decompress(encoded) + decompressor.flush()
+
+# --- Codificação do Payload ---
+
+def encode_payload(data: bytes, compress: bool = True) -> bytes:
+    """
+    Monta o Payload binário: [Codec (1)] + dados. Com compress=True, testa todas as
+    codificações e escolhe a menor para este quadro (empate -> sem compressão).
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    candidates = [(CODEC_RAW, data)]
+    if compress and data:
+        candidates.append((CODEC_HUFFMAN, huffman_encode(data)))
+        candidates.append((CODEC_DEFLATE, deflate_encode(data)))
+
+    codec, encoded = min(candidates, key=lambda c: len(c[1]))
+    if len(encoded) > MAX_ENCODED_LEN:
+        raise ValueError(f"Payload muito longo. Máximo de {MAX_ENCODED_LEN} bytes após a codificação.")
+    return bytes([codec]) + encoded
+
+def decode_payload(payload: bytes) -> bytes:
+    """
+    Recupera os bytes originais de um Payload binário.
+    """
+    if not payload:
+        raise ValueError("Payload binário vazio (falta o byte de codec).")
+    codec, encoded = payload[0], payload[1:]
+    if codec == CODEC_RAW:
+        return encoded
+    if codec == CODEC_HUFFMAN:
+        return huffman_decode(encoded)
+    if codec == CODEC_DEFLATE:
+        try:
+            return deflate_decode(encoded)
+        except zlib.error as e:
+            raise ValueError(f"Payload DEFLATE inválido: {e}")
+    raise ValueError(f"Codec de payload desconhecido: 0x{codec:02x}")
+
+def format_payload(data: str | bytes) -> str:
+    """
+    Texto para exibição (CLIs e FSMs) de uma mensagem recebida. Bytes decodificados no
+    modo binário aparecem como UTF-8 quando formam texto imprimível; caso contrário,
+    aparecem com escapes (\\xNN, \\n...), sem perder informação.
+    """
+    if isinstance(data, str):
+        return data
+    try:
+        text = data.decode('utf-8')
+        if text.isprintable():
+            return text
+    except UnicodeDecodeError:
+        pass
+    return repr(data)[2:-1]
+
+def frame_airtime(payload_len: int) -> float:
+    """
+    Tempo de ar (s) de um quadro no formato estendido com payload_len bytes.
+    Preamble (4) + Sync (2) + ID TX + ID RX + Len (3) + Payload + CRC (2).
+    """
+    return (4 + 2 + 3 + payload_len + 2) * 8 / BAUD_RATE
+
+if __name__ == '__main__':
+    from afsk_tx import build_packet
+
+    telemetry = [
+        "TEMP=23.5;HUM=61;BAT=3.71;STATUS=OK",
+        "LAT=-23.5505;LON=-46.6333;ALT=760;VEL=0.0",
+        "BEACON ID=20 SEQ=1042 UPTIME=86400",
+        "STATUS=ERRO TEMP=85.2 ALERTA",
+        "OK",
+    ]
+    names = {CODEC_RAW: "sem compressão", CODEC_DEFLATE: "DEFLATE+dicionário", CODEC_HUFFMAN: "Huffman"}
+
+    total_text = 0.0
+    total_binary = 0.0
+    for msg in telemetry:
+        payload = encode_payload(msg.encode('ascii'))
+        assert decode_payload(payload) == msg.encode('ascii')
+        # O modo binário usa o mesmo build_packet (Payload em bytes)
+        build_packet(payload, 10, 20)
+        t_text = frame_airtime(len(msg))
+        t_bin = frame_airtime(len(payload))
+        total_text += t_text
+        total_binary += t_bin
+        print(f"{msg!r:48} {len(msg):3d} -> {len(payload):3d} bytes ({names[payload[0]]}) "
+              f"| ar: {t_text * 1000:5.0f} -> {t_bin * 1000:5.0f} ms")
+
+    print(f"Tempo de ar total: {total_text:.2f}s -> {total_binary:.2f}s "
+          f"(redução de {100 * (1 - total_binary / total_text):.0f}%)")
+
+    # Dados binários arbitrários também passam (codec escolhido automaticamente)
+    blob = bytes(range(200))
+    assert decode_payload(encode_payload(blob)) == blob
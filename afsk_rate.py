@@ -0,0 +1,507 @@
+from typing import NamedTuple
+import numpy as np
+from afsk_utils import FS, BAUD_RATE, F0, F1, PREAMBLE_BYTE, calculate_crc16_ccitt, check_crc16_ccitt
+from afsk_rx import demodulate_windows
+
+# --- Escada de Configurações (Rate Ladder) ---
+
+class RateConfig(NamedTuple):
+    """
+    Configuração de enlace: taxa de símbolos, tons de '0'/'1' e FEC Hamming(7,4).
+
+    Como em afsk_utils, baud é o valor nominal e samples_per_bit é truncado
+    (FS // baud); as taxas efetivas são calculadas a partir de samples_per_bit.
+    """
+    index: int
+    baud: int
+    f0: float
+    f1: float
+    fec: bool
+
+    @property
+    def samples_per_bit(self) -> int:
+        return FS // self.baud
+
+    @property
+    def symbol_rate(self) -> float:
+        """
+        Taxa de símbolos efetiva (ex.: 600 nominal -> 8000 / 13 = 615.4 baud).
+        """
+        return FS / self.samples_per_bit
+
+    @property
+    def bit_rate(self) -> float:
+        """
+        Taxa útil efetiva (bits de dados por segundo, descontando o FEC).
+        """
+        return self.symbol_rate * (4 / 7 if self.fec else 1)
+
+# Do mais robusto ao mais rápido. O índice 1 é a configuração fixa de afsk_utils.
+RATE_LADDER = [
+    RateConfig(0, 300, F0, F1, True),
+    RateConfig(1, BAUD_RATE, F0, F1, False),
+    RateConfig(2, 600, 2400, 1200, True),
+    RateConfig(3, 600, 2400, 1200, False),
+    RateConfig(4, 1200, 2400, 1200, False),
+]
+BASE_RATE = RATE_LADDER[1]  # Preamble, Sync e cabeçalho sempre na taxa base
+
+# Limiares de margem F0/F1 (dB) por degrau: sobe acima de UP, desce abaixo de DOWN.
+# A faixa entre os dois é a histerese (evita oscilar entre configurações). A margem
+# satura em valores diferentes em cada degrau (janelas de Goertzel mais curtas vazam
+# mais energia entre os tons), por isso os limiares são calibrados por degrau com a
+# tabela "SNR x margem" impressa por este módulo (20 quadros por célula):
+# - UP[k]: margem do degrau k no SNR em que o degrau k+1 acerta 20/20, mais ~2 dB;
+# - DOWN[k]: margem do degrau k logo acima do SNR em que ele começa a perder quadros.
+#   O degrau 4 satura em ~10.9 dB, então a faixa útil dele é estreita (10 -> 12 dB de SNR).
+RATE_UP_DB = [15.0, 16.5, 15.5, 21.0, None]
+RATE_DOWN_DB = [None, 12.5, 11.5, 13.0, 9.8]
+RATE_UP_FRAMES = 3  # Quadros consecutivos acima do limiar para subir um degrau
+MARGIN_EWMA = 0.5  # Suavização da margem medida
+
+# --- Formato do Quadro Adaptativo ---
+# [Preamble (4)] [Sync (2)] [ID TX] [ID RX] [Rate] [Len]  -> taxa base
+# [Payload (0-255)] [CRC-16 (2)]                            -> configuração indicada em Rate
+# Rate: nibble alto = índice usado neste quadro; nibble baixo = índice recomendado ao par.
+# A Sync Word é diferente da do formato estendido, então receptores antigos ignoram o quadro.
+ADAPTIVE_SYNC_WORD = 0xD42D
+ADAPTIVE_HEADER_LEN = 4  # ID TX + ID RX + Rate + Len
+ADAPTIVE_SEARCH_BITS = 1024  # Janela (bits na taxa base) de cada busca da Sync em iter_adaptive_frames
+
+# --- FEC Hamming(7,4) ---
+# Geradora sistemática: [d1 d2 d3 d4 p1 p2 p3]
+_HAMMING_G = np.array([
+    [1, 0, 0, 0, 1, 1, 0],
+    [0, 1, 0, 0, 1, 0, 1],
+    [0, 0, 1, 0, 0, 1, 1],
+    [0, 0, 0, 1, 1, 1, 1],
+], dtype=np.uint8)
+_HAMMING_H = np.array([
+    [1, 1, 0, 1, 1, 0, 0],
+    [1, 0, 1, 1, 0, 1, 0],
+    [0, 1, 1, 1, 0, 0, 1],
+], dtype=np.uint8)
+# Síndrome -> posição do bit errado (-1 = sem erro)
+_SYNDROME_POS = {0: -1}
+for _pos in range(7):
+    _s = _HAMMING_H[:, _pos]
+    _SYNDROME_POS[int(_s[0]) << 2 | int(_s[1]) << 1 | int(_s[2])] = _pos
+_SYNDROME_TABLE = np.array([_SYNDROME_POS[s] for s in range(8)])
+
+def hamming74_encode(bits: np.ndarray) -> np.ndarray:
+    """
+    Codifica bits (múltiplo de 4) em palavras de 7 bits.
+    """
+    return (bits.reshape(-1, 4) @ _HAMMING_G % 2).astype(np.uint8).ravel()
+
+def hamming74_decode(bits: np.ndarray) -> np.ndarray:
+    """
+    Decodifica palavras de 7 bits, corrigindo até 1 erro por palavra.
+    """
+    words = bits.reshape(-1, 7).copy()
+    s = words @ _HAMMING_H.T % 2
+    pos = _SYNDROME_TABLE[s[:, 0] << 2 | s[:, 1] << 1 | s[:, 2]]
+    rows = np.nonzero(pos >= 0)[0]
+    words[rows, pos[rows]] ^= 1
+    return words[:, :4].ravel()
+
+# --- Modulação / Demodulação Parametrizadas ---
+
+def _bit_waveforms(config: RateConfig) -> np.ndarray:
+    # O tom recomeça com fase zero a cada bit, como em afsk_utils.modulate_bit
+    t = np.arange(config.samples_per_bit) / FS
+    return 0.707 * np.stack([np.sin(2 * np.pi * config.f0 * t), np.sin(2 * np.pi * config.f1 * t)])
+
+def modulate_bits(bits: np.ndarray, config: RateConfig) -> np.ndarray:
+    """
+    Modula uma sequência de bits na configuração indicada (em bloco, sem laço por bit).
+    """
+    return _bit_waveforms(config)[bits].ravel()
+
+def demodulate_bits(audio: np.ndarray, config: RateConfig) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Demodula todas as janelas de bit do trecho na configuração indicada
+    (Goertzel vetorizado de afsk_rx).
+
+    Retorna: (bits, potencias) com potencias[:, 0] = energia em F0 e [:, 1] = energia em F1.
+    """
+    return demodulate_windows(audio, config.samples_per_bit, config.f0, config.f1)
+
+def energy_margin_db(powers: np.ndarray) -> float:
+    """
+    Qualidade do enlace: razão (dB) entre a energia do tom vencedor e a do tom
+    perdedor, em média sobre os bits do quadro. Cresce com a SNR do canal.
+    """
+    winner = powers.max(axis=1).mean()
+    loser = powers.min(axis=1).mean()
+    return float(10 * np.log10(winner / max(loser, 1e-12)))
+
+def _bytes_to_bits(data: bytes) -> np.ndarray:
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+def _preamble_sync_bits() -> np.ndarray:
+    return _bytes_to_bits(bytes([PREAMBLE_BYTE] * 4) + ADAPTIVE_SYNC_WORD.to_bytes(2, 'big'))
+
+# --- Quadro Adaptativo ---
+
+def build_adaptive_frame(payload: bytes, user_id_tx: int, user_id_rx: int, config: RateConfig,
+                         recommended: int) -> np.ndarray:
+    """
+    Monta e modula um quadro adaptativo: cabeçalho na taxa base, Payload + CRC em config.
+    """
+    if len(payload) > 255:
+        raise ValueError("Payload muito longo. O Payload deve ter no máximo 255 bytes.")
+    header = bytes([user_id_tx, user_id_rx, config.index << 4 | recommended, len(payload)])
+    crc = calculate_crc16_ccitt(header + payload)
+
+    head_bits = np.concatenate((_preamble_sync_bits(), _bytes_to_bits(header)))
+    body_bits = _bytes_to_bits(payload + crc)
+    if config.fec:
+        body_bits = hamming74_encode(body_bits)
+    return np.concatenate((modulate_bits(head_bits, BASE_RATE), modulate_bits(body_bits, config)))
+
+class AdaptiveFrame(NamedTuple):
+    id_tx: int
+    id_rx: int
+    rate_index: int  # Configuração usada neste quadro
+    recommended: int  # Configuração que o remetente recomenda para o nosso TX
+    payload: bytes
+    crc_ok: bool
+    margin_db: float
+
+def _find_adaptive_sync(audio: np.ndarray) -> tuple[int, np.ndarray] | None:
+    """
+    Procura Preamble + Sync adaptativa testando vários deslocamentos dentro de um bit
+    (sincronismo de bit grosseiro), já que o quadro pode começar em qualquer amostra.
+
+    Vários deslocamentos (até ~1 bit para cada lado) reproduzem o padrão exato, mas a
+    margem de energia tem pico no alinhamento correto. O início é o centroide das
+    posições ponderado pela margem em escala linear: no sinal limpo cai exatamente
+    no alinhamento (as duas amostras vizinhas do pico empatam, então "maior margem"
+    sozinha erra por uma amostra) e, com ruído, erra menos de uma amostra em média.
+
+    Retorna: a amostra do fim da Sync, ou None.
+    """
+    spb = BASE_RATE.samples_per_bit
+    pattern = _preamble_sync_bits()
+    found = []  # (início do primeiro padrão encontrado, margem) para cada deslocamento
+    for offset in range(spb):
+        bits, powers = demodulate_bits(audio[offset:], BASE_RATE)
+        if len(bits) < len(pattern):
+            continue
+        windows = np.lib.stride_tricks.sliding_window_view(bits, len(pattern))
+        matches = np.nonzero(np.all(windows == pattern, axis=1))[0]
+        if len(matches):
+            i = matches[0]
+            found.append((offset + i * spb, energy_margin_db(powers[i:i + len(pattern)])))
+    if not found:
+        return None
+
+    # Apenas o primeiro quadro: os deslocamentos que enxergam o mesmo padrão ficam a menos de 1 bit
+    first = min(start for start, _ in found)
+    same_frame = [(start, margin) for start, margin in found if start <= first + spb]
+    starts = np.array([start for start, _ in same_frame])
+    weights = 10 ** (np.array([margin for _, margin in same_frame]) / 10)
+    return int(round(np.sum(starts * weights) / np.sum(weights))) + len(pattern) * spb
+
+def _body_bits(payload_len: int, config: RateConfig) -> int:
+    n_bits = (payload_len + 2) * 8
+    return n_bits * 7 // 4 if config.fec else n_bits
+
+# Maior quadro adaptativo (Payload de 255 bytes no degrau mais lento), em amostras
+MAX_ADAPTIVE_FRAME_SAMPLES = (len(_preamble_sync_bits()) + ADAPTIVE_HEADER_LEN * 8) * BASE_RATE.samples_per_bit + max(
+    _body_bits(255, config) * config.samples_per_bit for config in RATE_LADDER)
+_HEADER_SAMPLES = ADAPTIVE_HEADER_LEN * 8 * BASE_RATE.samples_per_bit
+
+def _read_adaptive_header(audio: np.ndarray, sync_end: int) -> tuple[bytes, RateConfig, int] | None:
+    """
+    Demodula o cabeçalho (taxa base) logo após a Sync; o trecho deve contê-lo inteiro.
+
+    Retorna: (cabeçalho, configuração do corpo, amostra do fim do quadro) ou None se
+    o campo Rate indicar um degrau inexistente.
+    """
+    bits, _ = demodulate_bits(audio[sync_end:sync_end + _HEADER_SAMPLES], BASE_RATE)
+    header = np.packbits(bits).tobytes()
+    rate_index = header[2] >> 4
+    if rate_index >= len(RATE_LADDER):
+        return None
+    config = RATE_LADDER[rate_index]
+    return header, config, sync_end + _HEADER_SAMPLES + _body_bits(header[3], config) * config.samples_per_bit
+
+def _decode_adaptive_body(audio: np.ndarray, header: bytes, config: RateConfig, body_start: int,
+                          body_end: int) -> AdaptiveFrame | None:
+    """
+    Demodula Payload + CRC na configuração indicada. Retorna None se o corpo estiver truncado.
+    """
+    body = audio[body_start:body_end]
+    # Tolera o arredondamento do alinhamento quando o quadro termina no fim do trecho
+    deficit = body_end - body_start - len(body)
+    if deficit > config.samples_per_bit // 2:
+        return None
+    if deficit:
+        body = np.concatenate((body, np.zeros(deficit)))
+    body_bits, powers = demodulate_bits(body, config)
+    if config.fec:
+        body_bits = hamming74_decode(body_bits)
+    body_bytes = np.packbits(body_bits).tobytes()
+
+    id_tx, id_rx, rate, _ = header
+    payload, crc = body_bytes[:-2], body_bytes[-2:]
+    return AdaptiveFrame(id_tx, id_rx, rate >> 4, min(rate & 0x0F, len(RATE_LADDER) - 1), payload,
+                         check_crc16_ccitt(header + payload, crc), energy_margin_db(powers))
+
+def iter_adaptive_frames(audio: np.ndarray):
+    """
+    Gerador de todos os quadros adaptativos de um trecho de áudio, em ordem.
+
+    A Sync é procurada em janelas de ADAPTIVE_SEARCH_BITS (com sobreposição de um
+    padrão), então cada amostra passa uma vez pela busca. Depois de um quadro com CRC
+    inválido, o Len pode estar errado: a busca recomeça logo após a Sync dele.
+    """
+    spb = BASE_RATE.samples_per_bit
+    overlap = (len(_preamble_sync_bits()) + 2) * spb
+    pos = 0
+    while pos < len(audio):
+        window = audio[pos:pos + ADAPTIVE_SEARCH_BITS * spb]
+        last_window = pos + len(window) >= len(audio)
+        sync_end = _find_adaptive_sync(window)
+        # Padrão colado no fim da janela: nem todos os deslocamentos o enxergam inteiro
+        if sync_end is None or (sync_end + spb > len(window) and not last_window):
+            if last_window:
+                return
+            pos += len(window) - overlap
+            continue
+
+        sync_end += pos
+        if sync_end + _HEADER_SAMPLES > len(audio):
+            return
+        extent = _read_adaptive_header(audio, sync_end)
+        if extent is None:
+            pos = sync_end
+            continue
+        header, config, frame_end = extent
+        frame = _decode_adaptive_body(audio, header, config, sync_end + _HEADER_SAMPLES, frame_end)
+        if frame is None:
+            return
+        yield frame
+        pos = frame_end if frame.crc_ok else sync_end
+
+def receive_adaptive_frame(audio: np.ndarray) -> AdaptiveFrame | None:
+    """
+    Primeiro quadro adaptativo do trecho de áudio. Retorna None se não encontrar
+    o padrão de sincronismo ou se o quadro estiver truncado.
+    """
+    return next(iter_adaptive_frames(audio), None)
+
+class AdaptiveDecoder:
+    """
+    Receptor incremental de quadros adaptativos: aceita blocos de áudio de qualquer
+    tamanho e devolve os quadros concluídos (com CRC válido ou não).
+
+    Enquanto caça a Sync, guarda só o suficiente para um padrão que esteja chegando;
+    depois de encontrá-la, descarta o áudio anterior e apenas espera o quadro completar
+    (o cabeçalho diz quantas amostras faltam), sem repetir a busca.
+    """
+
+    def __init__(self):
+        self._buffer = np.array([], dtype=np.float64)
+        self._in_frame = False  # _buffer começa logo após uma Sync encontrada
+
+    def feed(self, samples: np.ndarray) -> list[AdaptiveFrame]:
+        spb = BASE_RATE.samples_per_bit
+        self._buffer = np.concatenate((self._buffer, samples))
+        frames = []
+        while True:
+            if not self._in_frame:
+                sync_end = _find_adaptive_sync(self._buffer)
+                if sync_end is None or sync_end + spb > len(self._buffer):
+                    keep = (len(_preamble_sync_bits()) + 2) * spb
+                    self._buffer = self._buffer[max(0, len(self._buffer) - keep):]
+                    return frames
+                self._buffer = self._buffer[sync_end:]
+                self._in_frame = True
+
+            if len(self._buffer) < _HEADER_SAMPLES:
+                return frames
+            extent = _read_adaptive_header(self._buffer, 0)
+            if extent is None:
+                self._in_frame = False
+                continue
+            header, config, frame_end = extent
+            if len(self._buffer) < frame_end:
+                return frames
+            frame = _decode_adaptive_body(self._buffer, header, config, _HEADER_SAMPLES, frame_end)
+            frames.append(frame)
+            # CRC inválido: o Len pode estar errado, então a busca recomeça logo após a Sync
+            self._buffer = self._buffer[frame_end if frame.crc_ok else 0:]
+            self._in_frame = False
+
+# --- Controle de Taxa ---
+
+class LinkState:
+    """
+    Estado de um enlace (por par): margem medida e configuração recomendada ao par.
+    """
+
+    def __init__(self, start_index: int = BASE_RATE.index):
+        self.margin_db = None
+        self.recommended = start_index  # O que pedimos ao par (com base no que recebemos dele)
+        self.peer_recommended = start_index  # O que o par pediu para o nosso TX
+        self.good_streak = 0
+
+class RateController:
+    """
+    Adaptação de taxa por enlace, dirigida pela margem F0/F1 dos quadros recebidos.
+
+    O receptor mede a margem de cada quadro do par e decide, com histerese, qual
+    degrau da escada recomendar; a recomendação vai no nibble baixo do campo Rate
+    dos quadros que enviamos ao par. O transmissor usa o degrau que o par recomendou.
+    Quadros com CRC inválido derrubam a recomendação imediatamente um degrau.
+    """
+
+    def __init__(self, start_index: int = BASE_RATE.index):
+        self.start_index = start_index
+        self.links = {}
+
+    def _link(self, peer_id: int) -> LinkState:
+        return self.links.setdefault(peer_id, LinkState(self.start_index))
+
+    def tx_config(self, peer_id: int) -> RateConfig:
+        """
+        Configuração a usar no próximo quadro para o par.
+        """
+        return RATE_LADDER[self._link(peer_id).peer_recommended]
+
+    def recommendation_for(self, peer_id: int) -> int:
+        """
+        Índice recomendado ao par (vai no campo Rate do próximo quadro para ele).
+        """
+        return self._link(peer_id).recommended
+
+    def on_frame(self, frame: AdaptiveFrame):
+        """
+        Atualiza o enlace com um quadro recebido do par.
+        """
+        link = self._link(frame.id_tx)
+        if frame.crc_ok:
+            link.peer_recommended = frame.recommended
+
+        # A margem é comparada com os limiares do degrau em que o quadro veio
+        if link.margin_db is None or frame.rate_index != link.recommended:
+            link.margin_db = frame.margin_db
+        else:
+            link.margin_db = MARGIN_EWMA * frame.margin_db + (1 - MARGIN_EWMA) * link.margin_db
+        i = frame.rate_index
+
+        if not frame.crc_ok or (RATE_DOWN_DB[i] is not None and link.margin_db < RATE_DOWN_DB[i]):
+            link.recommended = max(0, i - 1)
+            link.good_streak = 0
+        elif RATE_UP_DB[i] is not None and link.margin_db > RATE_UP_DB[i]:
+            link.good_streak += 1
+            if link.good_streak >= RATE_UP_FRAMES:
+                link.recommended = i + 1
+                link.good_streak = 0
+        else:
+            link.recommended = i
+            link.good_streak = 0
+
+    def on_frame_lost(self, peer_id: int):
+        """
+        Quadro do par não detectado (ou ACK perdido): volta um degrau no nosso TX.
+        """
+        link = self._link(peer_id)
+        link.peer_recommended = max(0, link.peer_recommended - 1)
+
+# --- Simulação ---
+
+def awgn(signal: np.ndarray, snr_db: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Canal com ruído branco gaussiano aditivo (SNR em relação à potência do tom).
+    """
+    noise_power = 0.707 ** 2 / 2 / 10 ** (snr_db / 10)
+    return signal + rng.normal(0.0, np.sqrt(noise_power), len(signal))
+
+def simulate_link(snr_profile, adaptive: bool, payload: bytes, seed: int = 0) -> dict:
+    """
+    Simula uma sequência de quadros A -> B (com retorno ideal B -> A da recomendação)
+    sobre um canal cuja SNR varia segundo snr_profile (uma SNR por quadro).
+
+    Retorna estatísticas de goodput (bits de payload entregues / tempo de ar).
+    """
+    rng = np.random.default_rng(seed)
+    tx_side = RateController()
+    rx_side = RateController()
+    silence = np.zeros(BASE_RATE.samples_per_bit * 4)
+    delivered_bits = 0
+    airtime = 0.0
+    lost = 0
+
+    for snr_db in snr_profile:
+        config = tx_side.tx_config(20) if adaptive else BASE_RATE
+        recommended = tx_side.recommendation_for(20) if adaptive else BASE_RATE.index
+        signal = build_adaptive_frame(payload, 10, 20, config, recommended)
+        airtime += len(signal) / FS
+
+        received = receive_adaptive_frame(awgn(np.concatenate((silence, signal, silence)), snr_db, rng))
+        if received is None or received.rate_index != config.index:
+            lost += 1
+            tx_side.on_frame_lost(20)
+            continue
+
+        rx_side.on_frame(received)
+        if received.crc_ok and received.payload == payload:
+            delivered_bits += len(payload) * 8
+        else:
+            lost += 1
+        # Retorno: o próximo quadro de B para A leva a recomendação de B
+        tx_side.links.setdefault(20, LinkState()).peer_recommended = rx_side.recommendation_for(10)
+
+    return {
+        "goodput_bps": delivered_bits / airtime,
+        "airtime_s": airtime,
+        "frames": len(snr_profile),
+        "lost": lost,
+    }
+
+if __name__ == '__main__':
+    payload = b"TEMP=23.5;HUM=61;BAT=3.71;STATUS=OK;LAT=-23.5505;LON=-46.6333"
+
+    # Canal variável: trechos limpos, marginais e ruins
+    profile = [25] * 40 + [12] * 40 + [4] * 40 + [18] * 40 + [8] * 40
+    for name, adaptive in (("Fixo (300 baud, sem FEC)", False), ("Adaptativo", True)):
+        stats = simulate_link(profile, adaptive, payload)
+        print(f"{name:26} goodput: {stats['goodput_bps']:7.1f} bit/s | "
+              f"quadros perdidos: {stats['lost']:3d}/{stats['frames']} | tempo de ar: {stats['airtime_s']:.1f}s")
+
+    # Vários quadros no mesmo trecho (um por degrau), inclusive recebidos em blocos
+    rng = np.random.default_rng(1)
+    parts = [np.zeros(57)]
+    for config in RATE_LADDER:
+        parts += [build_adaptive_frame(f"degrau {config.index}".encode(), 10, 20, config, config.index), np.zeros(300)]
+    channel = awgn(np.concatenate(parts), 20, rng)
+    expected = [f"degrau {config.index}".encode() for config in RATE_LADDER]
+    decoder = AdaptiveDecoder()
+    streamed = [frame for i in range(0, len(channel), 1000) for frame in decoder.feed(channel[i:i + 1000])]
+    print(f"Quadros em sequência: {len(list(iter_adaptive_frames(channel)))} de uma vez, "
+          f"{sum(frame.crc_ok for frame in streamed)} em blocos de 1000 amostras (esperado: {len(expected)})")
+    assert [frame.payload for frame in iter_adaptive_frames(channel)] == expected
+    assert [frame.payload for frame in streamed] == expected
+
+    # Margem medida x SNR do canal (calibração dos limiares da escada)
+    rng = np.random.default_rng(2)
+    trials = 20
+    print(f"\nSNR (dB) | margem F0/F1 média (dB) / quadros com CRC válido em {trials}, por degrau")
+    for snr_db in range(0, 27, 2):
+        cells = []
+        for config in RATE_LADDER:
+            margins = []
+            ok = 0
+            for _ in range(trials):
+                # Silêncio antes e depois: o quadro não começa em fronteira de bit conhecida
+                audio = np.concatenate((np.zeros(100), build_adaptive_frame(payload, 1, 2, config, 0), np.zeros(77)))
+                frame = receive_adaptive_frame(awgn(audio, snr_db, rng))
+                if frame:
+                    margins.append(frame.margin_db)
+                    ok += frame.crc_ok
+            cells.append(f"{np.mean(margins):5.1f}/{ok:2d}" if margins else "  ---/ 0")
+        print(f"{snr_db:8} | " + "  ".join(cells))
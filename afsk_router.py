@@ -0,0 +1,152 @@
+import numpy as np
+from afsk_utils import FS, SAMPLES_PER_BIT, BROADCAST_ID
+from afsk_resample import iter_resampled
+from afsk_payload import decode_payload
+from afsk_stream import FrameDecoder, ReceivedFrame
+from afsk_wavio import FORMAT_WAV, PcmStreamReader
+
+class PacketRouter:
+    """
+    Tabela de roteamento do receptor: várias estações lógicas servidas por uma
+    única passagem de demodulação do mesmo canal.
+
+    - subscribe(id, handler): assina um ID (com callbacks opcionais);
+    - BROADCAST_ID: entregue a todos os IDs assinados (se accept_broadcast=True);
+    - promiscuous=True: aceita qualquer quadro e o entrega aos handlers de
+      subscribe_all(), mesmo sem assinatura para o ID RX.
+
+    Quadros cujo ID RX não corresponde a nenhuma assinatura são abortados logo
+    após o cabeçalho (o Payload não é demodulado; veja FrameDecoder).
+
+    Handlers recebem (frame: ReceivedFrame, payload: bytes). Com binary=True, payload
+    são os bytes decodificados pelo modo binário (afsk_payload), e frame.payload também
+    passa a trazê-los; quadros com Payload binário inválido são contados em
+    payload_errors e não são entregues.
+    """
+
+    def __init__(self, subscriptions=(), promiscuous: bool = False, accept_broadcast: bool = True,
+                 deliver_bad_crc: bool = False, binary: bool = False):
+        self.promiscuous = promiscuous
+        self.accept_broadcast = accept_broadcast
+        self.deliver_bad_crc = deliver_bad_crc
+        self.binary = binary
+        self._handlers = {user_id: [] for user_id in subscriptions}
+        self._all_handlers = []
+        self._decoder = FrameDecoder(address_filter=self.accepts)
+        self.frames_delivered = 0
+        self.crc_errors = 0
+        self.payload_errors = 0
+
+    @property
+    def subscriptions(self) -> set[int]:
+        return set(self._handlers)
+
+    @property
+    def frames_skipped(self) -> int:
+        return self._decoder.frames_skipped
+
+    def subscribe(self, user_id: int, handler=None):
+        """
+        Assina um ID (0-254) e, opcionalmente, registra um callback para ele.
+        """
+        if not 0 <= user_id <= 255 or user_id == BROADCAST_ID:
+            raise ValueError(f"ID inválido para assinatura: {user_id}")
+        handlers = self._handlers.setdefault(user_id, [])
+        if handler is not None:
+            handlers.append(handler)
+
+    def unsubscribe(self, user_id: int):
+        self._handlers.pop(user_id, None)
+
+    def subscribe_all(self, handler):
+        """
+        Registra um callback que recebe todos os quadros aceitos (útil com promiscuous=True).
+        """
+        self._all_handlers.append(handler)
+
+    def accepts(self, id_tx: int, id_rx: int) -> bool:
+        """
+        Decide, apenas pelo cabeçalho, se o quadro deve ser demodulado até o fim.
+        """
+        if self.promiscuous or id_rx in self._handlers:
+            return True
+        return id_rx == BROADCAST_ID and self.accept_broadcast and bool(self._handlers)
+
+    def feed(self, samples: np.ndarray) -> list[ReceivedFrame]:
+        """
+        Demodula um bloco de amostras e despacha os quadros aceitos aos handlers.
+        Retorna os quadros entregues.
+        """
+        delivered = []
+        for frame in self._decoder.feed(samples):
+            if not frame.crc_ok:
+                self.crc_errors += 1
+                if not self.deliver_bad_crc:
+                    continue
+            if self.binary and frame.crc_ok:
+                try:
+                    frame = frame._replace(payload=decode_payload(frame.payload))
+                except ValueError:
+                    self.payload_errors += 1
+                    continue
+            self._dispatch(frame, frame.payload)
+            delivered.append(frame)
+        return delivered
+
+    def _dispatch(self, frame: ReceivedFrame, payload: bytes):
+        if frame.id_rx == BROADCAST_ID:
+            targets = [h for handlers in self._handlers.values() for h in handlers]
+        else:
+            targets = list(self._handlers.get(frame.id_rx, ()))
+        for handler in targets + self._all_handlers:
+            handler(frame, payload)
+        self.frames_delivered += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscriptions": len(self._handlers),
+            "delivered": self.frames_delivered,
+            "skipped": self.frames_skipped,
+            "crc_errors": self.crc_errors,
+            "payload_errors": self.payload_errors,
+        }
+
+def route_stream(source, router: PacketRouter, fmt: str = FORMAT_WAV, fs: int = FS):
+    """
+    Lê um stream de áudio (arquivo, stdin, socket) e o entrega ao roteador, bloco a bloco.
+    """
+    with PcmStreamReader(source, fmt=fmt, fs=fs) as reader:
+        for chunk in iter_resampled(reader, reader.fs, FS):
+            router.feed(chunk)
+    return router.stats()
+
+if __name__ == '__main__':
+    import time
+    from afsk_tx import build_packet, modulate_packet
+
+    # Canal compartilhado: 40 quadros para 40 destinos diferentes + 1 broadcast
+    parts = []
+    for i in range(40):
+        parts.append(modulate_packet(build_packet(f"Telemetria da estacao {i:02d}", 100, i)))
+        parts.append(np.zeros(SAMPLES_PER_BIT * 30))
+    parts.append(modulate_packet(build_packet("Aviso geral", 100, BROADCAST_ID)))
+    channel = np.concatenate(parts)
+
+    # Uma estação por ID par (20 estações lógicas em um único processo)
+    inbox = {}
+    router = PacketRouter()
+    for station in range(0, 40, 2):
+        router.subscribe(station, lambda frame, payload, s=station: inbox.setdefault(s, []).append(payload))
+
+    t0 = time.perf_counter()
+    router.feed(channel)
+    t_router = time.perf_counter() - t0
+    print(f"Roteador: {router.stats()} em {t_router:.2f}s")
+    assert inbox[4] == [b"Telemetria da estacao 04", b"Aviso geral"]
+    assert 5 not in inbox
+
+    # Referência: demodulação completa de todos os quadros (sem aborto antecipado)
+    t0 = time.perf_counter()
+    FrameDecoder().feed(channel)
+    t_full = time.perf_counter() - t0
+    print(f"Demodulação completa: {t_full:.2f}s (aborto antecipado economizou {100 * (1 - t_router / t_full):.0f}%)")
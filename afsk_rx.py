@@ -5,11 +5,35 @@ from afsk_utils import (
     PREAMBLE_BYTE, SYNC_WORD,
     bits_to_ascii, check_crc16_ccitt
 )
+from afsk_wavio import PcmStreamReader
+from afsk_resample import resample_to_profile
+from afsk_payload import decode_payload
 
 # --- Constantes de Framing ---
 PREAMBLE_BITS_LEN = 4 * 8  # 4 bytes * 8 bits/byte
 SYNC_WORD_BITS_LEN = 2 * 8  # 2 bytes * 8 bits/byte
 HEADER_FIXED_BITS_LEN = 5 * 8 # ID_TX (1) + ID_RX (1) + Len (1) + CRC (2) -> 5 bytes * 8 bits/byte
+# Padrão completo Preamble (4 x 0xAA) + Sync Word (0x2DD4) = 48 bits
+PREAMBLE_SYNC_PATTERN = [int(b) for b in format(PREAMBLE_BYTE, '08b')] * 4 + [int(b) for b in format(SYNC_WORD, '016b')]
+
+# --- Detector Grosseiro de Sincronismo ---
+# Energia em banda (F0/F1) em janelas de bit avaliadas em uma grade de meio bit: uma das
+# duas fases fica a no máximo 1/4 de bit do alinhamento correto. Cada janela vira um valor
+# suave (P1 - P0) / (P1 + P0) e o padrão é procurado por correlação normalizada.
+COARSE_STEP = SAMPLES_PER_BIT // 2
+# Ruído puro (10 min, sigma = 0.05) não passa de ~0.37; quadros com amplitude 0.05
+# sob o mesmo ruído ficam acima de 0.45 (mediana ~0.7).
+COARSE_CORRELATION_THRESHOLD = 0.4
+
+# --- Portão de Energia ---
+# Antes do Goertzel grosseiro, só a energia (soma dos quadrados) de cada janela de bit,
+# suavizada em GATE_SMOOTH_BITS janelas. O piso de ruído é o percentil GATE_FLOOR_PERCENTILE
+# (os intervalos entre quadros); o Goertzel grosseiro só roda onde a energia passa de
+# GATE_RATIO x piso. Suavizado em 32 bits, o ruído varia ~5% em torno da média: o limiar
+# fica a ~7 desvios do ruído, e um quadro com metade da potência do ruído ainda passa.
+GATE_SMOOTH_BITS = 32
+GATE_FLOOR_PERCENTILE = 5
+GATE_RATIO = 1.5
 
 # --- Algoritmo de Goertzel ---
 
@@ -70,6 +94,33 @@ def demodulate_bit(samples: np.ndarray) -> int:
         # Caso de empate (raro), pode indicar ruído ou sinal fraco
         return -2 # Indica indecisão
 
+# --- Goertzel Vetorizado ---
+
+def goertzel_bank(n: int, frequencies) -> np.ndarray:
+    """
+    Vetores da DFT de n pontos nos bins de Goertzel (k = round(n * f / FS)) de cada
+    frequência. Para janelas em linhas, |janelas @ banco|^2 é a energia de Goertzel
+    de todas elas em uma única multiplicação de matrizes.
+    """
+    vectors = []
+    for f in frequencies:
+        k = round(n * f / FS)
+        vectors.append(np.exp(-2j * np.pi * k * np.arange(n) / n))
+    return np.stack(vectors, axis=1)
+
+def demodulate_windows(audio: np.ndarray, samples_per_bit: int = SAMPLES_PER_BIT,
+                       f0: float = F0, f1: float = F1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Demodula todas as janelas de bit (consecutivas, a partir da amostra 0) de uma vez.
+
+    Retorna: (bits, potencias) com potencias[:, 0] = energia em f0 e [:, 1] = energia em f1.
+    """
+    n = samples_per_bit
+    windows = audio[:len(audio) // n * n].reshape(-1, n)
+    powers = np.abs(windows @ goertzel_bank(n, (f0, f1))) ** 2
+    bits = (powers[:, 1] > powers[:, 0]).astype(np.uint8)
+    return bits, powers
+
 # --- Lógica de Recepção e Desempacotamento ---
 
 def find_sync(bit_sequence: list[int], sync_word_bits: list[int]) -> int:
@@ -99,11 +150,15 @@ def find_sync(bit_sequence: list[int], sync_word_bits: list[int]) -> int:
             
     return start_index
 
-def unpack_packet(bit_sequence: list[int], my_user_id: int) -> tuple[str, bool, bool]:
+def unpack_packet(bit_sequence: list[int], my_user_id, binary: bool = False) -> tuple[str | bytes, bool, bool]:
     """
     Desempacota a sequência de bits a partir do início do pacote (após a Sync Word).
     
-    Retorna: (mensagem_texto, crc_ok, addressed_to_me)
+    my_user_id pode ser um único ID (int) ou um conjunto de IDs assinados.
+    Com binary=True, o Payload é decodificado pelo modo binário (afsk_payload) e a
+    mensagem é devolvida como bytes (para exibir, use afsk_payload.format_payload).
+    
+    Retorna: (mensagem, crc_ok, addressed_to_me)
     """
     
     # O pacote começa após a Sync Word.
@@ -124,7 +179,10 @@ def unpack_packet(bit_sequence: list[int], my_user_id: int) -> tuple[str, bool,
     print(f"  > ID TX: {id_tx}, ID RX: {id_rx}, Payload Len: {payload_len} bytes")
     
     # 2. Verifica Endereçamento (Formato Estendido)
-    addressed_to_me = (id_rx == my_user_id)
+    if isinstance(my_user_id, (set, frozenset)):
+        addressed_to_me = (id_rx in my_user_id)
+    else:
+        addressed_to_me = (id_rx == my_user_id)
     if not addressed_to_me:
         print(f"  > Pacote não endereçado a mim (Meu ID: {my_user_id}). Ignorando Payload.")
         return "", False, False # Retorna vazio se não for endereçado a mim
@@ -163,67 +221,243 @@ def unpack_packet(bit_sequence: list[int], my_user_id: int) -> tuple[str, bool,
     
     crc_ok = check_crc16_ccitt(data_for_crc_bytes, received_crc_bytes)
     
+    # 6. Modo Binário: [Codec (1)] [Dados codificados]
+    if binary and crc_ok:
+        try:
+            message_text = decode_payload(data_for_crc_bytes[3:])
+        except ValueError as e:
+            return f"Erro: {e}", False, addressed_to_me
+    
     return message_text, crc_ok, addressed_to_me
 
-def receive_afsk_signal(filename: str, my_user_id: int) -> tuple[str, bool, str]:
+# --- Demodulação Preguiçosa (Dirigida pelo Len) ---
+
+def active_segments(audio: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Portão de energia: trechos (início, fim) em amostras onde a energia passa do piso de
+    ruído, alargados pelo comprimento do padrão Preamble + Sync e da suavização para
+    cobrir o início dos quadros. Custa uma multiplicação e soma por amostra (~1/7 de
+    demodular todas as janelas com Goertzel).
+
+    Se não houver trechos de silêncio/ruído para estimar o piso (gravação toda com
+    quadros, ou toda com ruído), retorna a gravação inteira.
+    """
+    n_blocks = len(audio) // SAMPLES_PER_BIT
+    if n_blocks < 2 * GATE_SMOOTH_BITS:
+        return [(0, len(audio))]
+    blocks = audio[:n_blocks * SAMPLES_PER_BIT].reshape(n_blocks, SAMPLES_PER_BIT)
+    energy = np.cumsum(np.einsum('ij,ij->i', blocks, blocks))
+    # Média móvel: smooth[i] cobre as janelas i .. i + GATE_SMOOTH_BITS - 1
+    smooth = np.concatenate(([energy[GATE_SMOOTH_BITS - 1]],
+                             energy[GATE_SMOOTH_BITS:] - energy[:-GATE_SMOOTH_BITS])) / GATE_SMOOTH_BITS
+    # Valores vizinhos da média móvel são quase iguais: o piso sai de uma amostra deles
+    floor = np.percentile(smooth[::GATE_SMOOTH_BITS // 2], GATE_FLOOR_PERCENTILE)
+    active = smooth > GATE_RATIO * floor
+    if not active.any():
+        return [(0, len(audio))]
+
+    # Alarga cada trecho ativo (o padrão começa na borda de subida, atenuada pela
+    # suavização) e junta os que se sobrepõem
+    pad = len(PREAMBLE_SYNC_PATTERN) + GATE_SMOOTH_BITS
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    segments = []
+    for b0, b1 in zip(edges[::2], edges[1::2]):
+        start = max(0, int(b0) - pad) * SAMPLES_PER_BIT
+        end = min(len(audio), (int(b1) + GATE_SMOOTH_BITS + pad) * SAMPLES_PER_BIT)
+        if segments and start <= segments[-1][1]:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+def coarse_sync_candidates(audio: np.ndarray, stats: dict = None) -> list[np.ndarray]:
+    """
+    Estágio grosseiro: procura posições prováveis do Preamble + Sync pela energia em
+    banda (F0/F1) em janelas de bit a cada meio bit, só nos trechos liberados pelo
+    portão de energia. Bits errados pelo ruído apenas reduzem a correlação suave,
+    então sinais fracos continuam gerando candidatos.
+
+    Posições vizinhas acima do limiar são o mesmo padrão visto em deslocamentos
+    diferentes (o Preamble 0xAA se repete a cada 2 bits) e formam um grupo.
+
+    Se stats for um dict, acumula 'coarse_windows' (janelas de Goertzel grosseiras).
+
+    Retorna: grupos em ordem crescente de posição; cada grupo traz as amostras onde o
+    padrão pode começar (incerteza de +-COARSE_STEP), da maior para a menor correlação.
+    """
+    bank = goertzel_bank(SAMPLES_PER_BIT, (F0, F1))
+    pattern = np.array(PREAMBLE_SYNC_PATTERN, dtype=np.float64) * 2 - 1
+    positions, scores = [], []
+    for seg_start, seg_end in active_segments(audio):
+        segment = audio[seg_start:seg_end]
+        n_windows = (len(segment) - SAMPLES_PER_BIT) // COARSE_STEP + 1
+        if n_windows < 2 * len(pattern):
+            continue
+        windows = np.lib.stride_tricks.sliding_window_view(segment, SAMPLES_PER_BIT)[::COARSE_STEP]
+        powers = np.abs(windows @ bank) ** 2
+        coarse = (powers[:, 1] - powers[:, 0]) / np.maximum(powers.sum(axis=1), 1e-12)
+        if stats is not None:
+            stats['coarse_windows'] = stats.get('coarse_windows', 0) + len(coarse)
+
+        # Janelas consecutivas de um mesmo alinhamento estão a 2 passos (1 bit) de distância
+        for phase in range(2):
+            corr = np.correlate(coarse[phase::2], pattern, 'valid') / len(pattern)
+            hits = np.nonzero(corr >= COARSE_CORRELATION_THRESHOLD)[0]
+            positions.append(seg_start + (phase + 2 * hits) * COARSE_STEP)
+            scores.append(corr[hits])
+    if not positions:
+        return []
+
+    positions = np.concatenate(positions)
+    scores = np.concatenate(scores)
+    order = np.argsort(positions, kind='stable')
+    positions, scores = positions[order], scores[order]
+    splits = np.flatnonzero(np.diff(positions) > 3 * SAMPLES_PER_BIT) + 1
+    return [group[np.argsort(-group_scores, kind='stable')]
+            for group, group_scores in zip(np.split(positions, splits), np.split(scores, splits))]
+
+def align_sync(audio: np.ndarray, candidate: int, stats: dict = None) -> int:
+    """
+    Estágio fino: demodula (Goertzel) o padrão Preamble + Sync em todos os deslocamentos
+    em torno do candidato e escolhe, entre os que reproduzem o padrão exato, o de maior
+    separação entre F0 e F1.
+
+    Se stats for um dict, acumula 'fine_windows' (janelas de Goertzel demoduladas).
+
+    Retorna: amostra do início do padrão, ou -1 se o candidato for falso.
+    """
+    pattern = np.array(PREAMBLE_SYNC_PATTERN, dtype=np.uint8)
+    n = len(pattern) * SAMPLES_PER_BIT
+    best, best_score = -1, -1.0
+    for start in range(max(0, candidate - COARSE_STEP), candidate + COARSE_STEP + 1):
+        bits, powers = demodulate_windows(audio[start:start + n])
+        if stats is not None:
+            stats['fine_windows'] = stats.get('fine_windows', 0) + len(bits)
+        if len(bits) < len(pattern) or not np.array_equal(bits, pattern):
+            continue
+        score = np.mean(np.abs(powers[:, 1] - powers[:, 0]) / np.maximum(powers.sum(axis=1), 1e-12))
+        if score > best_score:
+            best, best_score = start, score
+    return best
+
+def iter_frames_lazy(audio: np.ndarray, stats: dict = None):
+    """
+    Gerador de quadros com demodulação preguiçosa: a partir de cada grupo de candidatos
+    do detector grosseiro, demodula só o cabeçalho (3 bytes), depois exatamente Len + 2
+    bytes, e pula para o fim do quadro. O custo do Goertzel cresce com o tempo de ar
+    dos quadros, não com a duração da gravação.
+
+    Um candidato cujo quadro não cabe no restante do áudio (Len corrompido ou falso
+    alarme perto do fim) é descartado, e a busca continua nos candidatos seguintes.
+    Quadros com CRC inválido são produzidos, mas não escondem os candidatos seguintes.
+
+    Se stats for um dict, acumula 'coarse_windows' e 'fine_windows' (janelas de
+    Goertzel de cada estágio, incluindo cabeçalho e corpo).
+
+    Produz: (amostra_inicial, num_amostras, bits_apos_a_sync) para cada quadro.
+    """
+    header_bits_len = 3 * 8
+    pattern_samples = len(PREAMBLE_SYNC_PATTERN) * SAMPLES_PER_BIT
+    next_free = 0
+    for group in coarse_sync_candidates(audio, stats):
+        # Candidatos dentro de um quadro já lido são ignorados
+        group = group[group >= next_free - COARSE_STEP]
+        # Alinhamento fino a partir do candidato de maior correlação; os demais do grupo
+        # só são tentados se ele falhar
+        start = -1
+        for candidate in group:
+            start = align_sync(audio, int(candidate), stats)
+            if start >= 0:
+                break
+        if start < 0:
+            continue
+
+        body = start + pattern_samples
+        header_bits, _ = demodulate_windows(audio[body:body + header_bits_len * SAMPLES_PER_BIT])
+        if stats is not None:
+            stats['fine_windows'] = stats.get('fine_windows', 0) + len(header_bits)
+        if len(header_bits) < header_bits_len:
+            continue
+        payload_len = int(np.packbits(header_bits)[2])
+
+        rest_start = body + header_bits_len * SAMPLES_PER_BIT
+        rest_bits_len = (payload_len + 2) * 8
+        rest_end = rest_start + rest_bits_len * SAMPLES_PER_BIT
+        if rest_end > len(audio):
+            continue  # Não cabe no áudio: Len corrompido ou quadro truncado no fim
+        rest_bits, _ = demodulate_windows(audio[rest_start:rest_end])
+        if stats is not None:
+            stats['fine_windows'] += len(rest_bits)
+
+        packet_bits = np.concatenate((header_bits, rest_bits))
+        yield start, rest_end - start, packet_bits.tolist()
+        # Só pula o quadro se o CRC confere: com um Len corrompido, o "fim" do quadro
+        # cairia em cima dos quadros seguintes
+        data = np.packbits(packet_bits).tobytes()
+        if check_crc16_ccitt(data[:-2], data[-2:]):
+            next_free = rest_end
+
+def receive_afsk_signal(filename, my_user_id: int, binary: bool = False) -> tuple[str | bytes, bool, str]:
     """
     Função principal para ler, demodular e desempacotar o sinal AFSK.
     
-    Retorna: (mensagem_texto, crc_ok, status_message)
+    Args:
+        filename: Caminho do arquivo WAV, '-' para stdin ou um objeto de arquivo binário.
+        my_user_id (int): ID deste receptor.
+        binary (bool): Payload no modo binário (codec + dados, ver afsk_payload);
+            a mensagem é devolvida como bytes decodificados.
+    
+    Retorna: (mensagem, crc_ok, status_message)
     """
     print(f"--- Receptor AFSK (RX) ---")
     print(f"Lendo arquivo: '{filename}'")
     
     try:
         # 1. Leitura do Arquivo WAV
-        # wavfile.read retorna (FS, data)
-        # O FS lido deve ser 8000, mas usamos o FS fixo para o Goertzel
-        fs_read, audio_data = wavfile.read(filename)
-        
-        # Converte para float64 (normalização para -1.0 a 1.0)
-        audio_data = audio_data.astype(np.float64) / 32767.0
+        if isinstance(filename, str) and filename != '-':
+            # wavfile.read retorna (FS, data)
+            fs_read, audio_data = wavfile.read(filename)
+            
+            # Gravações estéreo: usa apenas o primeiro canal
+            if audio_data.ndim > 1:
+                audio_data = audio_data[:, 0]
+            
+            # Converte para float64 (normalização para -1.0 a 1.0)
+            audio_data = audio_data.astype(np.float64) / 32767.0
+        else:
+            # stdin e objetos de arquivo (inclusive não posicionáveis, como pipes)
+            with PcmStreamReader(filename) as reader:
+                fs_read = reader.fs
+                audio_data = reader.read_all()
         
     except Exception as e:
         return "", False, f"Erro ao ler o arquivo WAV: {e}"
 
-    # 2. Demodulação e Sincronismo de Bit (Simplificado)
-    # Assumimos que a taxa de amostragem está correta.
-    # O sincronismo de bit idealmente usaria o preâmbulo para ajustar o ponto de início
-    # de cada bloco de SAMPLES_PER_BIT.
-    
-    demodulated_bits = []
-    
-    # Ponto de início de cada bit (idealmente ajustado pelo preâmbulo)
-    # Aqui, fazemos uma demodulação "cega" (sem ajuste fino de fase/tempo)
-    for i in range(0, len(audio_data), SAMPLES_PER_BIT):
-        samples = audio_data[i:i + SAMPLES_PER_BIT]
-        
-        # Ignora o último bloco se for incompleto
-        if len(samples) < SAMPLES_PER_BIT:
-            continue
-            
-        bit = demodulate_bit(samples)
-        
-        # Ignora bits de erro (-1 ou -2)
-        if bit >= 0:
-            demodulated_bits.append(bit)
-        
-    print(f"  > Total de bits demodulados: {len(demodulated_bits)}")
-    
-    # 3. Busca pela Sync Word (Sincronismo de Pacote)
-    # 3. Busca pelo Padrão Preamble + Sync Word (Sincronismo de Pacote)
-    # A função find_sync agora busca o padrão completo e retorna o índice de início do ID TX
-    start_index = find_sync(demodulated_bits, []) # O segundo argumento é ignorado, mas mantido para compatibilidade
+    # 1.1. Reamostragem para a taxa do perfil (janelas de bit e bins do Goertzel
+    # são calculados para FS). Se a taxa já for FS, nada é feito.
+    if fs_read != FS:
+        print(f"  > Reamostrando de {fs_read} Hz para {FS} Hz")
+        audio_data = resample_to_profile(audio_data, fs_read, FS)
+
+    # 2. e 3. Sincronismo de Pacote e Demodulação (Preguiçosa)
+    # Um detector grosseiro (energia em banda a cada meio bit, correlação suave) varre o
+    # áudio; a demodulação bit a bit só roda a partir do candidato: alinhamento fino do
+    # padrão Preamble + Sync, cabeçalho (3 bytes) e exatamente Len + 2 bytes.
+    stats = {}
+    frame = next(iter_frames_lazy(audio_data, stats), None)
             
-    if start_index == -1:
+    if frame is None:
         return "", False, "Erro: Não foi possível encontrar o padrão Preamble + Sync Word."
         
-    print(f"  > Padrão Preamble+Sync encontrado. Início do pacote (ID TX) no bit: {start_index}")
+    start_sample, num_samples, packet_bits = frame
+    print(f"  > Padrão Preamble+Sync encontrado na amostra {start_sample}. "
+          f"Janelas de Goertzel: {stats.get('coarse_windows', 0)} grosseiras + "
+          f"{stats.get('fine_windows', 0)} finas (varredura completa: "
+          f"{len(audio_data) // SAMPLES_PER_BIT} janelas).")
     
     # 4. Desempacotamento
-    packet_bits = demodulated_bits[start_index:]
     
-    message_text, crc_ok, addressed_to_me = unpack_packet(packet_bits, my_user_id)
+    message_text, crc_ok, addressed_to_me = unpack_packet(packet_bits, my_user_id, binary)
     
     if not addressed_to_me:
         return "", False, "Pacote recebido, mas não endereçado a este ID."
@@ -253,3 +487,20 @@ if __name__ == '__main__':
     print(f"Status da Recepção: {status_not_mine}")
     print(f"Mensagem: '{message_not_mine}'")
     print(f"CRC OK: {crc_status_not_mine}")
+
+    # Teste com sinal fraco: quadro atenuado 20 dB sob ruído (sigma = 0.05), alinhado à grade
+    # de bits (caso mais favorável ao FrameDecoder, que varre todas as janelas com Goertzel)
+    from afsk_tx import build_packet, modulate_packet
+    from afsk_stream import FrameDecoder, bits_to_bytes
+    print("\n--- Teste de Sinal Fraco (20 tentativas) ---")
+    frame_signal = 0.1 * modulate_packet(build_packet("Ola Mundo AFSK", 10, MY_ID))
+    lazy_ok = full_ok = 0
+    for seed in range(20):
+        rng = np.random.default_rng(seed)
+        audio = np.concatenate((frame_signal, np.zeros(FS // 4)))
+        audio = audio + rng.normal(0, 0.05, len(audio))
+        for _, _, packet_bits in iter_frames_lazy(audio):
+            data = bits_to_bytes(packet_bits)
+            lazy_ok += check_crc16_ccitt(data[:-2], data[-2:])
+        full_ok += sum(frame.crc_ok for frame in FrameDecoder().feed(audio))
+    print(f"Quadros com CRC válido: demodulação preguiçosa {lazy_ok}/20, FrameDecoder {full_ok}/20")
@@ -0,0 +1,305 @@
+import sys
+import argparse
+from typing import NamedTuple
+import numpy as np
+from afsk_tx import build_packet, modulate_packet
+from afsk_cache import get_modulated_signal
+from afsk_rx import PREAMBLE_SYNC_PATTERN, demodulate_bit, unpack_packet
+from afsk_utils import FS, SAMPLES_PER_BIT, signal_to_int16, check_crc16_ccitt
+from afsk_resample import iter_resampled
+from afsk_payload import encode_payload, decode_payload, format_payload
+from afsk_wavio import FORMAT_WAV, FORMAT_RAW, PcmStreamReader, write_stream
+from afsk_compact import (FRAMING_STANDARD, FRAMING_COMPACT, MAX_BURST_FRAMES, BURST_FLUSH_TIMEOUT, CompactDecoder,
+                          iter_compact_bursts)
+
+# --- Configurações do Streaming ---
+DEFAULT_GAP_SECONDS = 0.0  # Silêncio entre quadros consecutivos
+HEADER_BITS_LEN = 3 * 8  # ID TX (1) + ID RX (1) + Len (1)
+CRC_BITS_LEN = 2 * 8
+
+# --- TX em Streaming ---
+
+def iter_tx_frames(messages, user_id_tx: int, user_id_rx: int = 0, gap_seconds: float = DEFAULT_GAP_SECONDS,
+                   cache=None, binary: bool = False):
+    """
+    Gerador que constrói e modula um quadro por mensagem, produzindo blocos int16.
+
+    As mensagens podem vir de qualquer iterável (lista, arquivo, stdin), e só um
+    quadro fica em memória por vez. Se um WaveformCache for passado, quadros
+    repetidos saem direto do cache. Com binary=True, cada mensagem vai no modo
+    binário (codec + dados, ver afsk_payload.encode_payload).
+    """
+    gap = np.zeros(int(FS * gap_seconds), dtype=np.int16)
+    first = True
+    for message in messages:
+        message = message.rstrip('\r\n')
+        if binary:
+            message = encode_payload(message)
+        if cache is not None:
+            signal, _ = get_modulated_signal(cache, message, user_id_tx, user_id_rx)
+        else:
+            signal = signal_to_int16(modulate_packet(build_packet(message, user_id_tx, user_id_rx)))
+
+        if not first and len(gap):
+            yield gap
+        first = False
+        yield signal
+
+def transmit_stream(messages, target, user_id_tx: int, user_id_rx: int = 0, fmt: str = FORMAT_WAV,
+                    gap_seconds: float = DEFAULT_GAP_SECONDS, framing: str = FRAMING_STANDARD,
+                    burst_size: int = MAX_BURST_FRAMES, binary: bool = False, flush_timeout: float = None) -> int:
+    """
+    Transmite uma sequência de mensagens em streaming para arquivo, stdout ou socket.
+
+    Com framing=FRAMING_COMPACT, as mensagens saem em rajadas compactas de até
+    burst_size quadros (ver afsk_compact). Com flush_timeout, uma rajada incompleta
+    sai quando a entrada fica esse tempo sem mensagens novas (entrada interativa).
+
+    Retorna: número total de amostras escritas.
+    """
+    if framing == FRAMING_COMPACT:
+        messages = (message.rstrip('\r\n') for message in messages)
+        if binary:
+            messages = (encode_payload(message) for message in messages)
+        bursts = iter_compact_bursts(messages, user_id_tx, user_id_rx, burst_size, flush_timeout)
+        frames = (signal_to_int16(burst) for burst in bursts)
+    elif framing == FRAMING_STANDARD:
+        frames = iter_tx_frames(messages, user_id_tx, user_id_rx, gap_seconds, binary=binary)
+    else:
+        raise ValueError(f"Modo de framing desconhecido: '{framing}'")
+    return write_stream(frames, target, fs=FS, fmt=fmt)
+
+# --- RX em Streaming ---
+
+class ReceivedFrame(NamedTuple):
+    """
+    Quadro detectado no stream (independente do endereçamento).
+
+    start_sample/num_samples referem-se ao áudio na taxa FS, a partir do início do Preamble.
+    """
+    start_sample: int
+    num_samples: int
+    id_tx: int
+    id_rx: int
+    payload: bytes
+    crc_ok: bool
+    bits: list  # Bits do pacote após a Sync Word (ID TX ... CRC)
+
+def bits_to_bytes(bits: list[int]) -> bytes:
+    """
+    Agrupa uma lista de bits (MSB-first) em bytes.
+    """
+    return bytes(int("".join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits) - 7, 8))
+
+class FrameDecoder:
+    """
+    Demodulador incremental: recebe blocos de amostras à medida que chegam e devolve
+    os quadros assim que o último bit do CRC é demodulado (latência de ~1 quadro).
+
+    Estados: caça ao padrão Preamble+Sync -> cabeçalho (3 bytes) -> Payload + CRC.
+
+    Se address_filter(id_tx, id_rx) for informado e retornar False logo após o
+    cabeçalho, o Payload e o CRC do quadro não são demodulados: o decodificador
+    salta (Len + 2) bytes de janelas e volta a caçar o sincronismo.
+    """
+
+    def __init__(self, address_filter=None):
+        self.address_filter = address_filter
+        self.frames_skipped = 0
+        self._samples = np.array([], dtype=np.float64)
+        self._window = 0  # Índice global da próxima janela de bit
+        self._skip_windows = 0  # Janelas restantes do quadro rejeitado
+        self._hunt_bits = []
+        self._packet_bits = None  # None = caçando o padrão de sincronismo
+        self._expected_bits = None
+        self._frame_start = 0
+
+    def feed(self, samples: np.ndarray) -> list[ReceivedFrame]:
+        """
+        Processa um bloco de amostras (float64) e retorna os quadros concluídos.
+        """
+        frames = []
+        self._samples = np.concatenate((self._samples, samples))
+        pattern_len = len(PREAMBLE_SYNC_PATTERN)
+
+        n_bits = len(self._samples) // SAMPLES_PER_BIT
+        for i in range(n_bits):
+            if self._skip_windows:
+                self._skip_windows -= 1
+                continue
+            window = self._window + i
+            bit = demodulate_bit(self._samples[i * SAMPLES_PER_BIT:(i + 1) * SAMPLES_PER_BIT])
+            if bit < 0:
+                continue
+
+            if self._packet_bits is None:
+                # Caça ao padrão: mantém apenas os últimos pattern_len bits
+                self._hunt_bits.append(bit)
+                if len(self._hunt_bits) > pattern_len:
+                    del self._hunt_bits[0]
+                if self._hunt_bits == PREAMBLE_SYNC_PATTERN:
+                    self._packet_bits = []
+                    self._expected_bits = None
+                    self._hunt_bits = []
+                    self._frame_start = (window - pattern_len + 1) * SAMPLES_PER_BIT
+                continue
+
+            self._packet_bits.append(bit)
+            if self._expected_bits is None and len(self._packet_bits) == HEADER_BITS_LEN:
+                payload_len = int("".join(map(str, self._packet_bits[16:24])), 2)
+                self._expected_bits = HEADER_BITS_LEN + payload_len * 8 + CRC_BITS_LEN
+
+                if self.address_filter is not None:
+                    id_tx = int("".join(map(str, self._packet_bits[0:8])), 2)
+                    id_rx = int("".join(map(str, self._packet_bits[8:16])), 2)
+                    if not self.address_filter(id_tx, id_rx):
+                        # Aborta cedo: pula Payload + CRC sem demodular
+                        self._skip_windows = (payload_len + 2) * 8
+                        self._packet_bits = None
+                        self._expected_bits = None
+                        self.frames_skipped += 1
+                        continue
+
+            if self._expected_bits is not None and len(self._packet_bits) == self._expected_bits:
+                frames.append(self._finish_frame((window + 1) * SAMPLES_PER_BIT))
+
+        self._window += n_bits
+        self._samples = self._samples[n_bits * SAMPLES_PER_BIT:]
+        return frames
+
+    def _finish_frame(self, end_sample: int) -> ReceivedFrame:
+        bits = self._packet_bits
+        data = bits_to_bytes(bits)
+        self._packet_bits = None
+        self._expected_bits = None
+        return ReceivedFrame(
+            start_sample=self._frame_start,
+            num_samples=end_sample - self._frame_start,
+            id_tx=data[0],
+            id_rx=data[1],
+            payload=data[3:-2],
+            crc_ok=check_crc16_ccitt(data[:-2], data[-2:]),
+            bits=bits,
+        )
+
+class StreamReceiver:
+    """
+    Receptor incremental para um ID: aplica o endereçamento e a verificação de CRC
+    (unpack_packet) a cada quadro entregue pelo FrameDecoder.
+
+    Com framing=FRAMING_COMPACT, decodifica rajadas compactas (CompactDecoder);
+    quadros compactos sem IDs são aceitos por qualquer receptor. Com binary=True,
+    o Payload é decodificado pelo modo binário (afsk_payload.decode_payload) e a
+    mensagem é entregue como bytes.
+    """
+
+    def __init__(self, my_user_id: int, framing: str = FRAMING_STANDARD, binary: bool = False):
+        if framing not in (FRAMING_STANDARD, FRAMING_COMPACT):
+            raise ValueError(f"Modo de framing desconhecido: '{framing}'")
+        self.my_user_id = my_user_id
+        self.framing = framing
+        self.binary = binary
+        self._decoder = CompactDecoder() if framing == FRAMING_COMPACT else FrameDecoder()
+
+    def feed(self, samples: np.ndarray) -> list[tuple[str | bytes, bool, str]]:
+        """
+        Processa um bloco de amostras (float64).
+
+        Retorna: lista de (mensagem, crc_ok, status_message) dos pacotes concluídos.
+        """
+        if self.framing == FRAMING_COMPACT:
+            return [self._compact_status(frame) for frame in self._decoder.feed(samples)]
+        return [self._packet_status(frame) for frame in self._decoder.feed(samples)]
+
+    def flush(self) -> list[tuple[str | bytes, bool, str]]:
+        """
+        Fim do stream: entrega os quadros que ainda dependiam de áudio futuro.
+        """
+        if self.framing == FRAMING_COMPACT:
+            return [self._compact_status(frame) for frame in self._decoder.flush()]
+        return []
+
+    def _compact_status(self, frame) -> tuple[str | bytes, bool, str]:
+        if frame.id_rx is not None and frame.id_rx != self.my_user_id:
+            return "", False, "Pacote recebido, mas não endereçado a este ID."
+        message_text = frame.payload.decode('ascii', errors='replace')
+        if not frame.crc_ok:
+            return message_text, False, "Pacote recebido, mas falhou na verificação de CRC-16-CCITT."
+        if self.binary:
+            try:
+                message_text = decode_payload(frame.payload)
+            except ValueError as e:
+                return "", False, f"Pacote recebido, mas o Payload binário é inválido: {e}"
+        return message_text, True, "Pacote recebido e verificado com sucesso."
+
+    def _packet_status(self, frame: ReceivedFrame) -> tuple[str | bytes, bool, str]:
+        message_text, crc_ok, addressed_to_me = unpack_packet(frame.bits, self.my_user_id, self.binary)
+
+        if not addressed_to_me:
+            return "", False, "Pacote recebido, mas não endereçado a este ID."
+        if not crc_ok:
+            return message_text, False, "Pacote recebido, mas falhou na verificação de CRC-16-CCITT."
+        return message_text, True, "Pacote recebido e verificado com sucesso."
+
+def receive_stream(source, my_user_id: int, fmt: str = FORMAT_WAV, fs: int = FS,
+                   framing: str = FRAMING_STANDARD, binary: bool = False):
+    """
+    Gerador que lê áudio em streaming (arquivo, stdin, socket ou objeto de arquivo)
+    e produz (mensagem, crc_ok, status_message) para cada pacote recebido.
+    """
+    with PcmStreamReader(source, fmt=fmt, fs=fs) as reader:
+        receiver = StreamReceiver(my_user_id, framing, binary)
+        # Áudio em outra taxa (ex.: 44.1/48 kHz) é reamostrado bloco a bloco para FS
+        for chunk in iter_resampled(reader, reader.fs, FS):
+            yield from receiver.feed(chunk)
+        yield from receiver.flush()
+
+# --- Interface de Linha de Comando ---
+
+def main(argv=None):
+    """
+    Uso em pipeline:
+        python afsk_stream.py tx --tx-id 10 --rx-id 20 < mensagens.txt | python afsk_stream.py rx --my-id 20
+    """
+    parser = argparse.ArgumentParser(description="TX/RX AFSK em streaming (WAV ou PCM cru).")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    tx = sub.add_parser("tx", help="Modula mensagens (argumentos ou stdin, uma por linha).")
+    tx.add_argument("messages", nargs="*")
+    tx.add_argument("--tx-id", type=int, default=10)
+    tx.add_argument("--rx-id", type=int, default=0)
+    tx.add_argument("--out", default="-", help="Arquivo, '-' (stdout) ou tcp:HOST:PORTA")
+    tx.add_argument("--raw", action="store_true", help="PCM cru (sem cabeçalho WAV)")
+    tx.add_argument("--gap", type=float, default=DEFAULT_GAP_SECONDS, help="Silêncio entre quadros (s)")
+    tx.add_argument("--framing", choices=(FRAMING_STANDARD, FRAMING_COMPACT), default=FRAMING_STANDARD)
+    tx.add_argument("--burst", type=int, default=MAX_BURST_FRAMES, help="Quadros por rajada no modo compacto (lendo stdin, rajadas incompletas saem "
+                         f"após {BURST_FLUSH_TIMEOUT}s sem novas linhas)")
+    tx.add_argument("--binary", action="store_true", help="Payload no modo binário (com compressão)")
+
+    rx = sub.add_parser("rx", help="Demodula áudio e imprime os pacotes recebidos.")
+    rx.add_argument("--my-id", type=int, default=20)
+    rx.add_argument("--in", dest="source", default="-", help="Arquivo, '-' (stdin) ou tcp:HOST:PORTA")
+    rx.add_argument("--raw", action="store_true", help="PCM cru (sem cabeçalho WAV)")
+    rx.add_argument("--fs", type=int, default=FS, help="Taxa de amostragem do PCM cru (Hz)")
+    rx.add_argument("--framing", choices=(FRAMING_STANDARD, FRAMING_COMPACT), default=FRAMING_STANDARD)
+    rx.add_argument("--binary", action="store_true", help="Payload no modo binário (com compressão)")
+
+    args = parser.parse_args(argv)
+    fmt = FORMAT_RAW if args.raw else FORMAT_WAV
+
+    if args.command == "tx":
+        messages = args.messages if args.messages else sys.stdin
+        # Lendo stdin (pipeline), não segura quadros esperando completar a rajada
+        flush_timeout = None if args.messages else BURST_FLUSH_TIMEOUT
+        total = transmit_stream(messages, args.out, args.tx_id, args.rx_id, fmt=fmt, gap_seconds=args.gap,
+                                framing=args.framing, burst_size=args.burst, binary=args.binary,
+                                flush_timeout=flush_timeout)
+        # Mensagens de status vão para stderr: stdout pode ser o próprio áudio
+        print(f"[TX] {total} amostras ({total / FS:.2f}s) escritas em '{args.out}'.", file=sys.stderr)
+    else:
+        for message_text, crc_ok, status_message in receive_stream(args.source, args.my_id, fmt=fmt, fs=args.fs,
+                                                                        framing=args.framing, binary=args.binary):
+            print(f"[RX] {status_message} Mensagem: '{format_payload(message_text)}' (CRC OK: {crc_ok})", flush=True)
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
 import time
 import numpy as np
-from afsk_tx import build_packet, modulate_packet, save_afsk_signal
+from afsk_tx import save_afsk_signal
 from afsk_rx import receive_afsk_signal
 from afsk_utils import FS
+from afsk_cache import WaveformCache, get_modulated_signal
+from afsk_payload import encode_payload, format_payload
 
 # --- Configurações do Sistema ---
 MY_ID = 20 # ID do usuário (pode ser alterado)
+BINARY_MODE = False # Payload no modo binário (codec + compressão); alternado com 'b' no IDLE
+
+# Cache de formas de onda moduladas (beacons e retransmissões não são modulados de novo)
+WAVEFORM_CACHE = WaveformCache()
 
 # --- FSM Estados ---
 STATE_IDLE = 0
@@ -25,7 +31,7 @@ def afsk_fsm():
     # Variáveis de estado
     message = ""
     target_id = 0
-    packet_to_send = None
+    binary_mode = BINARY_MODE
     signal_to_send = None
     
     # --- Loop Principal ---
@@ -34,9 +40,11 @@ def afsk_fsm():
         # --- STATE_IDLE ---
         if current_state == STATE_IDLE:
             print("\n[IDLE] Sistema em espera.")
-            user_input = input(f"Comando (Meu ID: {MY_ID}) - 't' para TX, 'r' para RX, 'q' para sair: ").strip().lower()
+            user_input = input(f"Comando (Meu ID: {MY_ID}) - 't' para TX, 'r' para RX, "
+                               f"'b' para modo binário ({'ligado' if binary_mode else 'desligado'}), 'q' para sair: ").strip().lower()
             
             if user_input == 'q':
+                print(f"[IDLE] Estatísticas do cache de TX: {WAVEFORM_CACHE.stats()}")
                 print("[IDLE] Encerrando o sistema.")
                 break
             elif user_input == 't':
@@ -50,6 +58,9 @@ def afsk_fsm():
                 current_state = STATE_TX_READY
             elif user_input == 'r':
                 current_state = STATE_RX_WAIT_PREAMBLE
+            elif user_input == 'b':
+                binary_mode = not binary_mode
+                print(f"[IDLE] Modo binário {'ligado' if binary_mode else 'desligado'}.")
             else:
                 print("[IDLE] Comando inválido.")
                 
@@ -58,13 +69,12 @@ def afsk_fsm():
             print(f"[TX_READY] Preparando pacote para '{message}' (TX ID: {MY_ID}, RX ID: {target_id}).")
             
             try:
-                # 1. Construção do Pacote
-                packet_to_send = build_packet(message, MY_ID, target_id)
-                
-                # 2. Modulação
-                signal_to_send = modulate_packet(packet_to_send)
+                # Construção do Pacote + Modulação (ou sinal já pronto no cache)
+                payload = encode_payload(message) if binary_mode else message
+                signal_to_send, cache_hit = get_modulated_signal(WAVEFORM_CACHE, payload, MY_ID, target_id)
                 
-                print(f"[TX_READY] Pacote pronto. Duração: {len(signal_to_send)/FS:.2f}s.")
+                origem = "cache" if cache_hit else "modulado"
+                print(f"[TX_READY] Pacote pronto ({origem}). Duração: {len(signal_to_send)/FS:.2f}s.")
                 current_state = STATE_TX_SENDING
                 
             except ValueError as e:
@@ -83,7 +93,6 @@ def afsk_fsm():
             print("[TX_SENDING] Transmissão concluída.")
             
             # Limpa variáveis de estado e volta ao IDLE
-            packet_to_send = None
             signal_to_send = None
             message = ""
             target_id = 0
@@ -96,12 +105,12 @@ def afsk_fsm():
             filename = input("Digite o nome do arquivo WAV a ser lido (ex: ola_mundo_afsk.wav): ")
             
             # A função receive_afsk_signal faz toda a lógica de demodulação, sincronismo e desempacotamento
-            message_text, crc_ok, status_message = receive_afsk_signal(filename, MY_ID)
+            message_text, crc_ok, status_message = receive_afsk_signal(filename, MY_ID, binary_mode)
             
             print("\n--- Resultado da Recepção ---")
             print(f"Status: {status_message}")
             if message_text:
-                print(f"Mensagem Recebida: '{message_text}'")
+                print(f"Mensagem Recebida: '{format_payload(message_text)}'")
             print(f"Verificação de Integridade (CRC OK): {crc_ok}")
             print("-----------------------------\n")
             
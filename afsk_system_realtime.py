@@ -2,14 +2,27 @@ import time
 import numpy as np
 import sounddevice as sd
 import threading
-from afsk_tx import build_packet, modulate_packet
 from afsk_rx import demodulate_bit, find_sync, unpack_packet
+from afsk_tx import build_packet
 from afsk_utils import FS, SAMPLES_PER_BIT, PREAMBLE_BYTE, SYNC_WORD
+from afsk_cache import WaveformCache
+from afsk_tx_pipeline import TxPipeline, DEFAULT_GAP_SECONDS
+from afsk_csma import CarrierSense, CsmaMac
+from afsk_payload import encode_payload, format_payload
 
 # --- Configurações do Sistema ---
 MY_ID = 10 # ID do usuário (pode ser alterado)
+BINARY_MODE = False # Payload no modo binário (codec + compressão); alternado com 'b' no IDLE
 CHUNK_SIZE = SAMPLES_PER_BIT * 4 # Processa 4 bits por vez para detecção de portadora/preâmbulo
 TIMEOUT_SECONDS = 10 # Tempo máximo de espera por um pacote
+TX_BLOCK_SIZE = 256 # Amostras por callback do stream de saída
+TX_GAP_SECONDS = DEFAULT_GAP_SECONDS # Intervalo entre quadros consecutivos
+
+# Acesso ao canal compartilhado (CSMA p-persistente; ver afsk_csma)
+CSMA_MAC = CsmaMac()
+
+# Cache de formas de onda moduladas (beacons e retransmissões não são modulados de novo)
+WAVEFORM_CACHE = WaveformCache()
 
 # --- FSM Estados ---
 STATE_IDLE = 0
@@ -21,14 +34,42 @@ STATE_RX_FINISHED = 5
 
 # --- Funções de Áudio em Tempo Real ---
 
-def play_signal(signal: np.ndarray):
+def start_tx_output(pipeline: TxPipeline) -> sd.OutputStream:
     """
-    Reproduz o sinal de áudio usando sounddevice.
+    Abre um stream de saída contínuo alimentado pelo pipeline de TX.
+    O stream fica aberto entre transmissões (tocando silêncio), então quadros
+    consecutivos não pagam o custo de reiniciar o dispositivo.
     """
-    # Converte o sinal de float (-1.0 a 1.0) para int16 (-32768 a 32767)
-    signal_int16 = (signal * 32767).astype(np.int16)
-    sd.play(signal_int16, samplerate=FS)
-    sd.wait() # Espera a reprodução terminar
+    def callback(outdata, frames, time_info, status):
+        pipeline.read(outdata[:, 0])
+
+    stream = sd.OutputStream(samplerate=FS, channels=1, dtype='int16',
+                             blocksize=TX_BLOCK_SIZE, callback=callback)
+    stream.start()
+    return stream
+
+def listen_before_talk(mac: CsmaMac) -> int:
+    """
+    Escuta o canal slot a slot (detecção de portadora por Goertzel em F0/F1) até que
+    o MAC libere a transmissão. Retorna o número de slots esperados.
+    """
+    sensor = CarrierSense()
+    with sd.InputStream(samplerate=FS, channels=1, dtype='int16') as stream:
+        def sense_channel():
+            # A própria leitura bloqueia por um slot
+            recording, overflowed = stream.read(int(FS * mac.slot_time))
+            return sensor.feed(recording[:, 0].astype(np.float64) / 32767.0)
+
+        waited = mac.wait_for_clear_channel(sense_channel, sleep=lambda seconds: None)
+    mac.on_success()
+    return waited
+
+def report_tx_errors(pipeline: TxPipeline):
+    """
+    Mostra as mensagens que o pipeline de TX descartou desde o último relatório.
+    """
+    for error in pipeline.pop_errors():
+        print(f"[TX] Quadro descartado (erro de modulação): {error}")
 
 # --- FSM Principal ---
 
@@ -41,8 +82,11 @@ def afsk_fsm():
     # Variáveis de estado
     message = ""
     target_id = 0
-    packet_to_send = None
-    signal_to_send = None
+    binary_mode = BINARY_MODE
+    
+    # Pipeline de TX (modulação em segundo plano + stream de saída contínuo)
+    tx_pipeline = TxPipeline(MY_ID, gap_seconds=TX_GAP_SECONDS, cache=WAVEFORM_CACHE)
+    tx_stream = None
     
     # Variáveis de RX
     demodulated_bits = []
@@ -52,10 +96,20 @@ def afsk_fsm():
         
         # --- STATE_IDLE ---
         if current_state == STATE_IDLE:
+            report_tx_errors(tx_pipeline)
             print("\n[IDLE] Sistema em espera.")
-            user_input = input(f"Comando (Meu ID: {MY_ID}) - 't' para TX, 'r' para RX, 'q' para sair: ").strip().lower()
+            user_input = input(f"Comando (Meu ID: {MY_ID}) - 't' para TX, 'r' para RX, "
+                               f"'b' para modo binário ({'ligado' if binary_mode else 'desligado'}), 'q' para sair: ").strip().lower()
             
             if user_input == 'q':
+                print("[IDLE] Aguardando o fim das transmissões pendentes...")
+                tx_pipeline.wait_idle()
+                if tx_stream is not None:
+                    tx_stream.close()
+                tx_pipeline.close()
+                report_tx_errors(tx_pipeline)
+                print(f"[IDLE] Quadros transmitidos: {tx_pipeline.frames_sent} (underruns: {tx_pipeline.underruns})")
+                print(f"[IDLE] Estatísticas do cache de TX: {WAVEFORM_CACHE.stats()}")
                 print("[IDLE] Encerrando o sistema.")
                 break
             elif user_input == 't':
@@ -68,6 +122,9 @@ def afsk_fsm():
                 current_state = STATE_TX_READY
             elif user_input == 'r':
                 current_state = STATE_RX_WAIT_PREAMBLE
+            elif user_input == 'b':
+                binary_mode = not binary_mode
+                print(f"[IDLE] Modo binário {'ligado' if binary_mode else 'desligado'}.")
             else:
                 print("[IDLE] Comando inválido.")
                 
@@ -76,10 +133,11 @@ def afsk_fsm():
             print(f"[TX_READY] Preparando pacote para '{message}' (TX ID: {MY_ID}, RX ID: {target_id}).")
             
             try:
-                packet_to_send = build_packet(message, MY_ID, target_id)
-                signal_to_send = modulate_packet(packet_to_send)
+                # Valida o pacote aqui; a modulação acontece na thread do pipeline
+                payload = encode_payload(message) if binary_mode else message
+                packet = build_packet(payload, MY_ID, target_id)
                 
-                print(f"[TX_READY] Pacote pronto. Duração: {len(signal_to_send)/FS:.2f}s.")
+                print(f"[TX_READY] Pacote pronto ({len(packet)} bytes).")
                 current_state = STATE_TX_SENDING
                 
             except ValueError as e:
@@ -88,19 +146,30 @@ def afsk_fsm():
                 
         # --- STATE_TX_SENDING ---
         elif current_state == STATE_TX_SENDING:
-            print("[TX_SENDING] Transmitindo sinal em tempo real...")
-            play_signal(signal_to_send)
-            print("[TX_SENDING] Transmissão concluída.")
+            if tx_stream is None:
+                tx_stream = start_tx_output(tx_pipeline)
+            
+            # CSMA só ao iniciar uma rajada: quadros enfileirados atrás de um que já
+            # está tocando seguem sem lacuna, pois o canal já é nosso.
+            if tx_pipeline.wait_idle(timeout=0):
+                waited = listen_before_talk(CSMA_MAC)
+                if waited:
+                    print(f"[TX_SENDING] Canal ocupado; transmissão adiada por {waited} slot(s).")
+            
+            # Não espera o fim da reprodução: o próximo quadro pode ser digitado e
+            # modulado enquanto este toca, e sai logo após o intervalo entre quadros.
+            tx_pipeline.submit(payload, target_id)
+            print("[TX_SENDING] Quadro enfileirado para transmissão em tempo real.")
             
             # Limpa variáveis de estado e volta ao IDLE
-            packet_to_send = None
-            signal_to_send = None
             message = ""
             target_id = 0
             current_state = STATE_IDLE
             
         # --- STATE_RX_WAIT_PREAMBLE (Escuta Contínua) ---
         elif current_state == STATE_RX_WAIT_PREAMBLE:
+            # Half-duplex: só escuta depois que a fila de TX esvaziar
+            tx_pipeline.wait_idle()
             print(f"[RX_WAIT_PREAMBLE] Escutando o canal (Meu ID: {MY_ID}). Pressione Ctrl+C para parar.")
             
             # Variáveis para o buffer de recepção
@@ -202,12 +271,12 @@ def afsk_fsm():
                 continue
                 
             # Processa o pacote completo
-            message_text, crc_ok, addressed_to_me = unpack_packet(packet_bits[:expected_total_bits], MY_ID)
+            message_text, crc_ok, addressed_to_me = unpack_packet(packet_bits[:expected_total_bits], MY_ID, binary_mode)
             
             print("\n--- Resultado da Recepção ---")
             print(f"Status: {'Pacote recebido e verificado com sucesso.' if crc_ok and addressed_to_me else 'Falha na Recepção.'}")
             if message_text:
-                print(f"Mensagem Recebida: '{message_text}'")
+                print(f"Mensagem Recebida: '{format_payload(message_text)}'")
             print(f"Verificação de Integridade (CRC OK): {crc_ok}")
             print(f"Endereçado a mim: {addressed_to_me}")
             print("-----------------------------\n")
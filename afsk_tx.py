@@ -2,7 +2,7 @@ import numpy as np
 from scipy.io.wavfile import write as wav_write
 from afsk_utils import (
     FS, SAMPLES_PER_BIT, PREAMBLE_BYTE, SYNC_WORD,
-    ascii_to_bits, modulate_bit, calculate_crc16_ccitt
+    ascii_to_bits, modulate_bit, calculate_crc16_ccitt, signal_to_int16
 )
 
 # --- Constantes de Framing ---
@@ -12,8 +12,10 @@ PREAMBLE_BYTES = bytes([PREAMBLE_BYTE] * 4)
 SYNC_WORD_BYTES = SYNC_WORD.to_bytes(2, byteorder='big')
 # Tamanho fixo dos campos de cabeçalho (sem payload e CRC)
 HEADER_FIXED_SIZE = len(PREAMBLE_BYTES) + len(SYNC_WORD_BYTES) + 1 + 1 + 1 # Preamble + Sync + ID_TX + ID_RX + Len
+# Moldes de um bit em int16 (linha 0: bit '0', linha 1: bit '1') para a modulação em bloco
+BIT_WAVEFORMS_INT16 = np.stack([signal_to_int16(modulate_bit(0)), signal_to_int16(modulate_bit(1))])
 
-def build_packet(message: str, user_id_tx: int, user_id_rx: int = 0) -> bytes:
+def build_packet(message: str | bytes, user_id_tx: int, user_id_rx: int = 0) -> bytes:
     """
     Constrói o pacote de dados completo (formato estendido) a partir da mensagem de texto.
     
@@ -21,7 +23,8 @@ def build_packet(message: str, user_id_tx: int, user_id_rx: int = 0) -> bytes:
     [Preamble (4)] [Sync_Word (2)] [User_ID TX (1)] [User_ID RX (1)] [Len (1)] [Payload (0-255)] [CRC-16 (2)]
     
     Args:
-        message (str): A mensagem de texto a ser transmitida (Payload).
+        message (str | bytes): A mensagem de texto a ser transmitida (Payload), ou
+            bytes já prontos no modo binário (ver afsk_payload.encode_payload).
         user_id_tx (int): ID do transmissor (0-255).
         user_id_rx (int): ID do receptor (0-255).
         
@@ -30,7 +33,10 @@ def build_packet(message: str, user_id_tx: int, user_id_rx: int = 0) -> bytes:
     """
     
     # 1. Payload (Mensagem)
-    payload_bytes = message.encode('ascii')
+    if isinstance(message, bytes):
+        payload_bytes = message
+    else:
+        payload_bytes = message.encode('ascii')
     payload_len = len(payload_bytes)
     
     if payload_len > 255:
@@ -81,14 +87,32 @@ def modulate_packet(packet_bytes: bytes) -> np.ndarray:
     # O resultado é um array de ponto flutuante (float64)
     return np.concatenate(audio_samples)
 
+def modulate_packet_into(packet_bytes: bytes, out: np.ndarray) -> int:
+    """
+    Modula o pacote diretamente em um buffer int16 pré-alocado (sem alocar o sinal).
+    
+    Cada bit gera sempre a mesma forma de onda (o tom recomeça com fase zero a cada
+    bit, como em modulate_bit), então o sinal é montado copiando os dois "moldes"
+    de bit em bloco. O resultado é idêntico ao de modulate_packet convertido para int16.
+    
+    Retorna: número de amostras escritas em out.
+    """
+    bits = np.unpackbits(np.frombuffer(packet_bytes, dtype=np.uint8))
+    n = len(bits) * SAMPLES_PER_BIT
+    if n > len(out):
+        raise ValueError(f"Buffer de saída muito pequeno ({len(out)} < {n} amostras).")
+    out[:n].reshape(len(bits), SAMPLES_PER_BIT)[:] = BIT_WAVEFORMS_INT16[bits]
+    return n
+
 def save_afsk_signal(signal: np.ndarray, filename: str):
     """
     Salva o sinal de áudio AFSK em um arquivo WAV (8 kHz, 16 bits PCM).
     """
     # Converte o sinal de float (-1.0 a 1.0) para int16 (-32768 a 32767)
     # O sinal foi normalizado em afsk_utils para amplitude máxima de 0.707 (evitar clipping)
-    # Multiplicamos por 32767 e convertemos para int16
-    signal_int16 = (signal * 32767).astype(np.int16)
+    # Multiplicamos por 32767 e convertemos para int16 (sinais já em int16, como os
+    # do cache de formas de onda, são gravados diretamente)
+    signal_int16 = signal_to_int16(signal)
     
     # Salva o arquivo WAV
     wav_write(filename, FS, signal_int16)
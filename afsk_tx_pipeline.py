@@ -0,0 +1,193 @@
+import queue
+import threading
+import numpy as np
+from afsk_cache import get_modulated_signal
+from afsk_tx import HEADER_FIXED_SIZE, build_packet, modulate_packet_into
+from afsk_utils import FS, SAMPLES_PER_BIT
+
+# --- Configurações do Pipeline de TX ---
+NUM_BUFFERS = 3  # Buffers de saída reutilizáveis (um tocando, os demais sendo preenchidos)
+DEFAULT_GAP_SECONDS = 0.02  # Intervalo entre quadros consecutivos no canal
+MAX_FRAME_SAMPLES = (HEADER_FIXED_SIZE + 255 + 2) * 8 * SAMPLES_PER_BIT  # Payload máximo + CRC
+
+class TxPipeline:
+    """
+    Pipeline de transmissão sem lacunas (double/triple buffering).
+
+    Uma thread de trabalho retira mensagens da fila de envio e as modula diretamente
+    em um conjunto fixo de buffers int16 reutilizáveis (nada é alocado por quadro).
+    O dispositivo de saída consome um stream contínuo através de read(), chamado
+    pelo callback de áudio: enquanto um buffer toca, o próximo quadro já está sendo
+    modulado, e quadros consecutivos saem separados apenas por gap_seconds.
+
+    Quando não há quadros prontos, read() preenche com silêncio. Uma mensagem que não
+    pode ser modulada é descartada (conta como concluída para wait_idle) e o erro fica
+    em errors até ser retirado por pop_errors().
+    """
+
+    def __init__(self, user_id_tx: int, gap_seconds: float = DEFAULT_GAP_SECONDS,
+                 num_buffers: int = NUM_BUFFERS, cache=None):
+        if num_buffers < 2:
+            raise ValueError("O pipeline precisa de pelo menos 2 buffers.")
+        self.user_id_tx = user_id_tx
+        self.gap_samples = int(FS * gap_seconds)
+        self.cache = cache
+        self.frames_sent = 0
+        self.underruns = 0  # Blocos de silêncio emitidos com quadros ainda pendentes
+        self.errors = []  # Mensagens descartadas: "mensagem: erro"
+
+        self._requests = queue.Queue()
+        self._free = queue.Queue()
+        self._ready = queue.Queue()
+        for _ in range(num_buffers):
+            self._free.put(np.zeros(MAX_FRAME_SAMPLES + self.gap_samples, dtype=np.int16))
+
+        self._current = None  # (buffer, n_amostras)
+        self._pos = 0
+        self._pending = 0  # Quadros submetidos e ainda não totalmente tocados
+        self._lock = threading.Lock()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._worker = threading.Thread(target=self._run, name="afsk-tx-modulator", daemon=True)
+        self._worker.start()
+
+    # --- Lado do usuário ---
+
+    def submit(self, message, user_id_rx: int = 0):
+        """
+        Enfileira uma mensagem (str ou bytes) para transmissão. Não bloqueia.
+        """
+        with self._lock:
+            self._pending += 1
+            self._idle.clear()
+        self._requests.put((message, user_id_rx))
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """
+        Espera até que todos os quadros submetidos tenham sido tocados.
+        """
+        return self._idle.wait(timeout)
+
+    def pop_errors(self) -> list[str]:
+        """
+        Retira e retorna os erros de modulação acumulados desde a última chamada.
+        """
+        with self._lock:
+            errors, self.errors = self.errors, []
+        return errors
+
+    def close(self):
+        """
+        Encerra a thread de modulação.
+        """
+        self._requests.put(None)
+        self._worker.join()
+
+    # --- Thread de modulação ---
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+            message, user_id_rx = request
+            buf = self._free.get()  # Bloqueia se todos os buffers estiverem em uso (contrapressão)
+            try:
+                n = self._modulate_into(message, user_id_rx, buf)
+            except Exception as e:
+                # Qualquer falha descarta só esta mensagem: a thread segue viva e
+                # _pending não fica preso (wait_idle retornaria nunca)
+                with self._lock:
+                    self.errors.append(f"{message!r:.40}: {e}")
+                self._free.put(buf)
+                self._frame_done()
+                continue
+            # Intervalo entre quadros faz parte do próprio buffer
+            buf[n:n + self.gap_samples] = 0
+            self._ready.put((buf, n + self.gap_samples))
+
+    def _modulate_into(self, message, user_id_rx: int, buf: np.ndarray) -> int:
+        if self.cache is not None:
+            signal, _ = get_modulated_signal(self.cache, message, self.user_id_tx, user_id_rx)
+            buf[:len(signal)] = signal
+            return len(signal)
+        return modulate_packet_into(build_packet(message, self.user_id_tx, user_id_rx), buf)
+
+    def _frame_done(self):
+        with self._lock:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.set()
+
+    # --- Lado do dispositivo de áudio ---
+
+    def read(self, out: np.ndarray):
+        """
+        Preenche out (int16) com o próximo trecho do stream contínuo de saída.
+        Deve ser chamado pelo callback do dispositivo de áudio.
+        """
+        filled = 0
+        while filled < len(out):
+            if self._current is None:
+                try:
+                    self._current = self._ready.get_nowait()
+                    self._pos = 0
+                except queue.Empty:
+                    out[filled:] = 0
+                    if self._pending:
+                        self.underruns += 1
+                    return
+
+            buf, n = self._current
+            take = min(len(out) - filled, n - self._pos)
+            out[filled:filled + take] = buf[self._pos:self._pos + take]
+            filled += take
+            self._pos += take
+
+            if self._pos == n:
+                self._free.put(buf)
+                self._current = None
+                self.frames_sent += 1
+                self._frame_done()
+
+if __name__ == '__main__':
+    import time
+    from afsk_tx import modulate_packet
+
+    # Dispositivo simulado: consome blocos no ritmo de tempo real acelerado (SPEEDUP x)
+    SPEEDUP = 20
+    BLOCK = 256
+    messages = [f"Quadro {i:03d} TEMP=23.5;HUM=61" for i in range(20)]
+
+    pipeline = TxPipeline(user_id_tx=10)
+    output = []
+    for msg in messages:
+        pipeline.submit(msg, 20)
+
+    t0 = time.perf_counter()
+    block = np.zeros(BLOCK, dtype=np.int16)
+    while not pipeline.wait_idle(timeout=0):
+        pipeline.read(block)
+        output.append(block.copy())
+        time.sleep(BLOCK / FS / SPEEDUP)
+    elapsed = time.perf_counter() - t0
+    pipeline.close()
+
+    frame_samples = sum(len(modulate_packet(build_packet(m, 10, 20))) for m in messages)
+    stream_samples = len(output) * BLOCK
+    print(f"Quadros: {pipeline.frames_sent} | underruns: {pipeline.underruns} | "
+          f"tempo simulado: {stream_samples / FS:.2f}s (real: {elapsed:.2f}s)")
+    print(f"Ocupação do canal: {100 * frame_samples / stream_samples:.1f}% da taxa de linha "
+          f"(lacuna entre quadros: {pipeline.gap_samples / FS * 1000:.0f} ms)")
+    assert pipeline.frames_sent == len(messages)
+
+    # Mensagens inválidas são descartadas sem travar o pipeline
+    pipeline = TxPipeline(user_id_tx=10)
+    for msg in ("A" * 300, 12345, "OK"):
+        pipeline.submit(msg, 20)
+    while not pipeline.wait_idle(timeout=0):
+        pipeline.read(block)
+    pipeline.close()
+    errors = pipeline.pop_errors()
+    print(f"Quadros: {pipeline.frames_sent} | descartados: {errors}")
+    assert pipeline.frames_sent == 1 and len(errors) == 2
@@ -12,6 +12,7 @@ SAMPLES_PER_BIT = FS // BAUD_RATE  # Número de amostras por bit
 # --- Especificações de Framing (Tabela 3) ---
 PREAMBLE_BYTE = 0xAA  # 10101010
 SYNC_WORD = 0x2DD4  # 0010110111010100
+BROADCAST_ID = 0xFF  # User_ID RX de difusão (entregue a todas as estações)
 CRC_POLY = 0x1021  # Polinômio CRC-16-CCITT (x^16 + x^12 + x^5 + 1)
 CRC_INIT = 0xFFFF  # Valor inicial do CRC
 CRC_XOROUT = 0x0000  # XOR de saída
@@ -82,6 +83,15 @@ def generate_tone(frequency: float, duration_seconds: float) -> np.ndarray:
     amplitude = 0.707
     return amplitude * np.sin(2 * np.pi * frequency * t)
 
+def signal_to_int16(signal: np.ndarray) -> np.ndarray:
+    """
+    Converte o sinal de float (-1.0 a 1.0) para int16 (-32768 a 32767).
+    Se o sinal já estiver em int16, ele é retornado sem cópia.
+    """
+    if signal.dtype == np.int16:
+        return signal
+    return (signal * 32767).astype(np.int16)
+
 def calculate_crc16_ccitt(data_bytes: bytes) -> bytes:
     """
     Calcula o CRC-16-CCITT (X.25) de um bloco de bytes.
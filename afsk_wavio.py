@@ -0,0 +1,284 @@
+import io
+import socket
+import struct
+import sys
+import numpy as np
+from afsk_utils import FS, SAMPLES_PER_BIT, signal_to_int16
+
+# --- Constantes de Formato ---
+WAV_HEADER_SIZE = 44  # Cabeçalho RIFF/WAVE canônico (PCM)
+BYTES_PER_SAMPLE = 2  # 16 bits PCM
+WAV_UNKNOWN_SIZE = 0xFFFFFFFF  # Tamanho "desconhecido" usado em pipes (convenção do sox/ffmpeg)
+FORMAT_WAV = 'wav'
+FORMAT_RAW = 'raw'  # PCM 16 bits little-endian, mono, sem cabeçalho
+
+# Leitura padrão: 8 bits de áudio por bloco (1 byte), para latência de ~1 quadro em pipes
+DEFAULT_CHUNK_SAMPLES = SAMPLES_PER_BIT * 8
+
+# --- Funções Auxiliares ---
+
+def wav_header(fs: int, num_samples: int | None) -> bytes:
+    """
+    Monta o cabeçalho WAV (mono, 16 bits PCM).
+    Se num_samples for None, os campos de tamanho são marcados como desconhecidos.
+    """
+    if num_samples is None:
+        data_size = WAV_UNKNOWN_SIZE
+        riff_size = WAV_UNKNOWN_SIZE
+    else:
+        data_size = num_samples * BYTES_PER_SAMPLE
+        riff_size = min(data_size + WAV_HEADER_SIZE - 8, WAV_UNKNOWN_SIZE)
+        data_size = min(data_size, WAV_UNKNOWN_SIZE)
+
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', riff_size, b'WAVE',
+        b'fmt ', 16,
+        1,  # PCM
+        1,  # Mono
+        fs,
+        fs * BYTES_PER_SAMPLE,  # Byte rate
+        BYTES_PER_SAMPLE,  # Block align
+        8 * BYTES_PER_SAMPLE,  # Bits por amostra
+        b'data', data_size
+    )
+
+def _is_seekable(f) -> bool:
+    try:
+        return f.seekable()
+    except (AttributeError, ValueError, OSError):
+        return False
+
+def _parse_endpoint(name: str, mode: str):
+    """
+    Resolve um destino/origem textual: '-' (stdout/stdin), 'tcp:HOST:PORTA' ou caminho de arquivo.
+    Retorna (objeto_arquivo, deve_fechar).
+    """
+    if name == '-':
+        stream = sys.stdout.buffer if 'w' in mode else sys.stdin.buffer
+        return stream, False
+    if name.startswith('tcp:'):
+        host, port = name[4:].rsplit(':', 1)
+        sock = socket.create_connection((host, int(port)))
+        f = sock.makefile(mode)
+        sock.close()  # O arquivo mantém a conexão aberta até ser fechado
+        return f, True
+    return open(name, mode), True
+
+def open_endpoint(target, mode: str):
+    """
+    Abre o destino (mode='wb') ou origem (mode='rb') de um stream de áudio.
+
+    Aceita: nome de arquivo, '-' (stdout/stdin), 'tcp:HOST:PORTA', um socket
+    conectado ou um objeto de arquivo binário já aberto.
+
+    Retorna: (objeto_arquivo, deve_fechar)
+    """
+    if isinstance(target, str):
+        return _parse_endpoint(target, mode)
+    if isinstance(target, socket.socket):
+        return target.makefile(mode), True
+    return target, False
+
+# --- Escrita em Streaming ---
+
+class PcmStreamWriter:
+    """
+    Escreve o sinal AFSK em streaming (WAV ou PCM cru), bloco a bloco.
+
+    No formato WAV o cabeçalho é escrito no início com tamanho desconhecido e
+    corrigido no fechamento quando o destino permite seek (arquivos). Em pipes
+    e sockets o cabeçalho fica com o tamanho "desconhecido", que os leitores
+    tratam como "ler até o EOF".
+    """
+
+    def __init__(self, target, fs: int = FS, fmt: str = FORMAT_WAV):
+        if fmt not in (FORMAT_WAV, FORMAT_RAW):
+            raise ValueError(f"Formato de áudio desconhecido: '{fmt}'")
+        self.fs = fs
+        self.fmt = fmt
+        self.samples_written = 0
+        self._f, self._should_close = open_endpoint(target, 'wb')
+        self._start = self._f.tell() if _is_seekable(self._f) else None
+        if fmt == FORMAT_WAV:
+            self._f.write(wav_header(fs, None))
+
+    def write(self, signal: np.ndarray):
+        """
+        Escreve um bloco de amostras (float ou int16) e o envia imediatamente.
+        """
+        samples = signal_to_int16(signal).astype('<i2', copy=False)
+        self._f.write(samples.tobytes())
+        self._f.flush()
+        self.samples_written += len(samples)
+
+    def close(self):
+        """
+        Finaliza o stream, corrigindo o cabeçalho WAV se possível.
+        """
+        if self._f is None:
+            return
+        try:
+            if self.fmt == FORMAT_WAV and self._start is not None:
+                end = self._f.tell()
+                self._f.seek(self._start)
+                self._f.write(wav_header(self.fs, self.samples_written))
+                self._f.seek(end)
+            self._f.flush()
+        finally:
+            if self._should_close:
+                self._f.close()
+            self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def write_stream(chunks, target, fs: int = FS, fmt: str = FORMAT_WAV) -> int:
+    """
+    Consome um iterável de blocos de sinal e os escreve em streaming no destino.
+    A memória usada é a de um bloco, independente do total transmitido.
+
+    Retorna: número total de amostras escritas.
+    """
+    with PcmStreamWriter(target, fs=fs, fmt=fmt) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+        return writer.samples_written
+
+# --- Leitura em Streaming ---
+
+class PcmStreamReader:
+    """
+    Lê áudio (WAV ou PCM cru) de arquivo, stdin ou socket, bloco a bloco.
+
+    Atributos preenchidos na abertura: fs (taxa de amostragem) e channels.
+    A iteração produz blocos float64 normalizados (-1.0 a 1.0) do primeiro canal.
+    """
+
+    def __init__(self, source, fmt: str = FORMAT_WAV, fs: int = FS,
+                 chunk_samples: int = DEFAULT_CHUNK_SAMPLES):
+        if fmt not in (FORMAT_WAV, FORMAT_RAW):
+            raise ValueError(f"Formato de áudio desconhecido: '{fmt}'")
+        self.fs = fs
+        self.channels = 1
+        self.chunk_samples = chunk_samples
+        self._remaining = None  # Bytes restantes no chunk 'data' (None = até o EOF)
+        self._f, self._should_close = open_endpoint(source, 'rb')
+        # read1 devolve o que já chegou no pipe, sem esperar o bloco inteiro
+        self._read = getattr(self._f, 'read1', self._f.read)
+        if fmt == FORMAT_WAV:
+            self._read_wav_header()
+        # Início das amostras e tamanho do chunk 'data' (para seek em arquivos)
+        self._data_start = self._f.tell() if _is_seekable(self._f) else None
+        self._data_size = self._remaining
+
+    def _read_exact(self, n: int) -> bytes:
+        data = b''
+        while len(data) < n:
+            part = self._f.read(n - len(data))
+            if not part:
+                raise ValueError("Stream WAV terminou antes do fim do cabeçalho.")
+            data += part
+        return data
+
+    def _read_wav_header(self):
+        riff, _, wave = struct.unpack('<4sI4s', self._read_exact(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError("O stream não está no formato RIFF/WAVE.")
+
+        bits_per_sample = None
+        while True:
+            chunk_id, chunk_size = struct.unpack('<4sI', self._read_exact(8))
+            if chunk_id == b'data':
+                if chunk_size not in (0, WAV_UNKNOWN_SIZE):
+                    self._remaining = chunk_size
+                break
+            body = self._read_exact(chunk_size + (chunk_size & 1))  # Chunks são alinhados em 2 bytes
+            if chunk_id == b'fmt ':
+                audio_format, self.channels, self.fs = struct.unpack('<HHI', body[:8])
+                bits_per_sample = struct.unpack('<H', body[14:16])[0]
+                if audio_format not in (1, 0xFFFE) or bits_per_sample != 16:
+                    raise ValueError("Apenas WAV PCM de 16 bits é suportado no modo streaming.")
+
+        if bits_per_sample is None:
+            raise ValueError("Cabeçalho WAV sem o chunk 'fmt '.")
+
+    def seek(self, sample_index: int):
+        """
+        Posiciona a leitura na amostra indicada (por canal). Exige uma origem com seek.
+        """
+        if self._data_start is None:
+            raise ValueError("A origem do áudio não permite seek.")
+        offset = sample_index * BYTES_PER_SAMPLE * self.channels
+        self._f.seek(self._data_start + offset)
+        if self._data_size is not None:
+            self._remaining = max(0, self._data_size - offset)
+
+    def __iter__(self):
+        frame_bytes = BYTES_PER_SAMPLE * self.channels
+        want = self.chunk_samples * frame_bytes
+        pending = b''
+        while True:
+            n = want if self._remaining is None else min(want, self._remaining)
+            if n <= 0:
+                break
+            data = self._read(n)
+            if not data:
+                break
+            if self._remaining is not None:
+                self._remaining -= len(data)
+
+            # Mantém bytes de uma amostra incompleta para o próximo bloco
+            data = pending + data
+            usable = len(data) - (len(data) % frame_bytes)
+            pending = data[usable:]
+            if usable == 0:
+                continue
+
+            samples = np.frombuffer(data[:usable], dtype='<i2')
+            if self.channels > 1:
+                samples = samples[::self.channels]
+            yield samples.astype(np.float64) / 32767.0
+
+    def read_all(self) -> np.ndarray:
+        """
+        Lê o stream inteiro e retorna o sinal completo (float64).
+        """
+        chunks = list(self)
+        if not chunks:
+            return np.array([], dtype=np.float64)
+        return np.concatenate(chunks)
+
+    def close(self):
+        if self._f is not None and self._should_close:
+            self._f.close()
+        self._f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+if __name__ == '__main__':
+    # Teste de ida e volta em memória (destino sem pipe: cabeçalho corrigido no final)
+    tone = np.sin(2 * np.pi * 1200 * np.arange(FS) / FS) * 0.707
+    buffer = io.BytesIO()
+    with PcmStreamWriter(buffer) as writer:
+        for i in range(0, len(tone), 1000):
+            writer.write(tone[i:i + 1000])
+        total = writer.samples_written
+    buffer.seek(0)
+    header = buffer.read(WAV_HEADER_SIZE)
+    print(f"Amostras escritas: {total} | Tamanho no cabeçalho: {struct.unpack('<I', header[40:44])[0]} bytes")
+
+    buffer.seek(0)
+    reader = PcmStreamReader(buffer, chunk_samples=512)
+    recovered = reader.read_all()
+    print(f"FS lido: {reader.fs} Hz | Amostras lidas: {len(recovered)}")
+    assert len(recovered) == total
+    assert np.max(np.abs(recovered - tone)) < 1e-3
+    print("Teste de streaming WAV OK.")